@@ -1,251 +1,128 @@
+import contextvars
+import functools
 import os
-from fastapi import APIRouter, HTTPException
-from models.chat import ChatRequest, ChatResponse
+from typing import Optional
+import anyio
+from fastapi import APIRouter, Header, HTTPException
+from models.chat import ChatRequest, ChatResponse, PrefetchRequest
 from services.llm_service import llm_service
+from services.prefetch_service import prefetch_service
 from services.rag_service import rag_service
+from services.ingest_service import ingest_service, extract_content
+from core.admission import AdmissionRejected, chat_gate, controllers, request_deadline
 from core.config import settings
+from core.retrieval import SUMMARY_NAMESPACE
+from core import profiling
 
 router = APIRouter()
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Endpoint for chat interactions with the sustainability assistant."""
+    deadline = request_deadline()
     try:
-        result = llm_service.generate_response(
-            question=request.message,
-            conversation_id=request.conversation_id
-        )
+        # Shed load on the event loop, before the request takes a worker thread
+        controllers["bedrock"].check(deadline)
+        with chat_gate.reserve():
+            # Off the event loop: waiting for an admission slot must not block other requests
+            result = await anyio.to_thread.run_sync(
+                functools.partial(
+                    contextvars.copy_context().run,
+                    llm_service.generate_response,
+                    question=request.message,
+                    conversation_id=request.conversation_id,
+                    collections=request.collections,
+                    file_types=request.file_types,
+                    deadline=deadline
+                ),
+                limiter=chat_gate.limiter()
+            )
 
         return ChatResponse(
             response=result["response"],
             conversation_id=result["conversation_id"],
-            sources=result["sources"]
+            sources=result["sources"],
+            model=result.get("model")
         )
 
+    except AdmissionRejected as e:
+        # 429 when the queue is full, 503 when the request could not start before its deadline
+        raise HTTPException(
+            status_code=429 if e.reason == "queue_full" else 503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
-@router.post("/ingest")
-async def ingest_documents():
-    """Endpoint to ingest documents into the vector database."""
+@router.post("/prefetch", status_code=202)
+async def prefetch(request: PrefetchRequest):
+    """Start retrieval for a question draft so the matching /chat can skip it."""
+    status = prefetch_service.schedule(
+        request.session_id,
+        request.text,
+        collections=request.collections,
+        file_types=request.file_types
+    )
+    return {"status": status}
+
+@router.get("/collections")
+async def list_collections():
+    """Collections available for filtering, with their vector counts."""
     try:
-        print("Starting direct document ingestion...")
-
-        # Direct approach - scan project directory
-        import os
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        docs_paths = [
-            os.path.join(project_root, "documentos"),
-            os.path.join(project_root, "docs"),
-            project_root
-        ]
-
-        all_texts = []
-        all_metadatas = []
-
-        for docs_path in docs_paths:
-            if os.path.exists(docs_path):
-                print(f"Scanning directory: {docs_path}")
-                for root, dirs, files in os.walk(docs_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        file_ext = os.path.splitext(file)[1].lower()
-
-                        # Process supported file types
-                        if file_ext in ['.txt', '.pdf', '.xlsx', '.xls', '.csv', '.docx', '.pptx']:
-                            try:
-                                print(f"Processing file: {file_path}")
-                                content = _extract_content_simple(file_path, file_ext)
-
-                                # Special debug for the specific Excel file
-                                if 'Dany- Huella de Carbono.xlsx' in file_path:
-                                    print("🔍 DEBUG: Analyzing Dany Excel file")
-                                    print(f"Content preview (first 500 chars): {content[:500]}")
-                                    print(f"Content contains 't_h9iy_energy_distribution_pct': {'t_h9iy_energy_distribution_pct' in content}")
-                                    print(f"Content contains 'energy_distribution': {'energy_distribution' in content.lower()}")
-
-                                if content.strip():
-                                    print(f"Content length: {len(content)} chars")
-                                    # Split content into chunks to avoid token limits
-                                    chunks = _split_text_for_ingestion(content, max_chunk_size=3000)
-                                    for i, chunk in enumerate(chunks):
-                                        all_texts.append(chunk)
-                                        all_metadatas.append({
-                                            "source": file_path,
-                                            "file_type": file_ext,
-                                            "chunk": i,
-                                            "total_chunks": len(chunks)
-                                        })
-                                    print(f"Processed: {os.path.basename(file_path)} → {len(chunks)} chunks ({len(content)} chars)")
-                                else:
-                                    print(f"No content extracted from: {file_path}")
-                            except Exception as e:
-                                print(f"Error processing {file_path}: {e}")
-
-        print(f"Total texts prepared: {len(all_texts)}")
-
-        if not all_texts:
-            raise HTTPException(status_code=500, detail="No documents found to ingest")
-
-        # Add to vector store
         from core.vector_store import vector_store
-        vector_store.add_texts(all_texts, all_metadatas)
-        print("Successfully added texts to vector store")
-
-        # Create detailed summary
-        file_summary = {}
-        for metadata in all_metadatas:
-            source = metadata["source"]
-            if source not in file_summary:
-                file_summary[source] = {
-                    "chunks": 0,
-                    "file_type": metadata["file_type"]
-                }
-            file_summary[source]["chunks"] += 1
-
+        stats = vector_store.index.describe_index_stats()
         return {
-            "status": "success",
-            "message": f"Successfully ingested {len(all_texts)} document chunks from {len(file_summary)} files",
-            "chunks_count": len(all_texts),
-            "files_count": len(file_summary),
-            "files_processed": [
-                {
-                    "filename": os.path.basename(source),
-                    "path": source,
-                    "chunks": info["chunks"],
-                    "file_type": info["file_type"]
-                }
-                for source, info in file_summary.items()
+            "collections": [
+                {"name": name or "default", "vectors": summary.vector_count}
+                for name, summary in sorted(stats.namespaces.items())
+                if name != SUMMARY_NAMESPACE
             ]
         }
-
     except Exception as e:
-        print(f"Error in ingest endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error ingesting documents: {str(e)}")
-
-def _split_text_for_ingestion(text: str, max_chunk_size: int = 3000) -> list[str]:
-    """Split text into chunks for ingestion, ensuring each chunk is under token limit."""
-    if len(text) <= max_chunk_size:
-        return [text]
-
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + max_chunk_size
-        if end < len(text):
-            # Find a good break point (sentence, paragraph, or word boundary)
-            break_point = text.rfind('\n\n', start, end)  # Paragraph break
-            if break_point == -1:
-                break_point = text.rfind('\n', start, end)  # Line break
-            if break_point == -1:
-                break_point = text.rfind('. ', start, end)  # Sentence break
-            if break_point == -1:
-                break_point = text.rfind(' ', start, end)  # Word break
-            if break_point == -1:
-                break_point = end  # Hard break
+        raise HTTPException(status_code=500, detail=f"Error listing collections: {str(e)}")
 
-            chunk = text[start:break_point].strip()
-            if chunk:
-                chunks.append(chunk)
-            start = break_point + 1
-        else:
-            chunk = text[start:].strip()
-            if chunk:
-                chunks.append(chunk)
-            start = len(text)
-
-    return chunks
-
-def _extract_content_simple(file_path: str, file_ext: str) -> str:
-    """Simple content extraction for supported file types."""
+@router.post("/ingest", status_code=202)
+async def ingest_documents(resume_job_id: Optional[str] = None,
+                           x_profile: Optional[str] = Header(None, alias=profiling.PROFILE_HEADER)):
+    """Start document ingestion as a background job (or resume one) and return its id."""
     try:
-        if file_ext == '.txt':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-
-        elif file_ext == '.pdf':
-            try:
-                from pypdf import PdfReader
-                reader = PdfReader(file_path)
-                content = ""
-                for page in reader.pages:
-                    content += page.extract_text() + "\n"
-                return content
-            except:
-                return f"PDF content extraction failed for: {os.path.basename(file_path)}"
-
-        elif file_ext in ['.xlsx', '.xls']:
-            try:
-                import pandas as pd
-                print(f"DEBUG: Attempting to read Excel file: {file_path}")
-
-                # Try to read all sheets
-                excel_data = pd.read_excel(file_path, sheet_name=None, engine='openpyxl')
-                print(f"DEBUG: Successfully read {len(excel_data)} sheets from Excel")
-
-                content = ""
-                for sheet_name, df in excel_data.items():
-                    print(f"DEBUG: Processing sheet '{sheet_name}' with shape {df.shape}")
-                    content += f"Sheet: {sheet_name}\n"
-
-                    # Convert DataFrame to string, handling NaN values
-                    df_str = df.fillna('').astype(str)
-                    content += df_str.to_string(index=False) + "\n\n"
-
-                print(f"DEBUG: Excel extraction completed, content length: {len(content)}")
-                return content
-
-            except Exception as e:
-                print(f"DEBUG: Excel extraction failed with error: {e}")
-                # Try alternative approach with xlrd for .xls files
-                try:
-                    if file_ext == '.xls':
-                        excel_data = pd.read_excel(file_path, sheet_name=None, engine='xlrd')
-                        content = ""
-                        for sheet_name, df in excel_data.items():
-                            content += f"Sheet: {sheet_name}\n"
-                            df_str = df.fillna('').astype(str)
-                            content += df_str.to_string(index=False) + "\n\n"
-                        return content
-                except Exception as e2:
-                    print(f"DEBUG: Alternative Excel extraction also failed: {e2}")
-
-                return f"Excel content extraction failed for: {os.path.basename(file_path)} - Error: {str(e)}"
-
-        elif file_ext == '.csv':
-            try:
-                import pandas as pd
-                df = pd.read_csv(file_path)
-                return df.to_string()
-            except:
-                return f"CSV content extraction failed for: {os.path.basename(file_path)}"
-
-        elif file_ext == '.docx':
-            try:
-                from docx import Document as DocxDocument
-                doc = DocxDocument(file_path)
-                content = ""
-                for paragraph in doc.paragraphs:
-                    content += paragraph.text + "\n"
-                return content
-            except:
-                return f"Word content extraction failed for: {os.path.basename(file_path)}"
-
-        elif file_ext in ['.pptx', '.ppt']:
-            try:
-                from unstructured.partition.auto import partition
-                elements = partition(file_path)
-                return "\n".join([str(element) for element in elements])
-            except:
-                return f"PowerPoint content extraction failed for: {os.path.basename(file_path)}"
-
-        else:
-            return ""
-
+        # The request only hands off, so profiling applies to the background job (see its profile_id)
+        job = ingest_service.start_job(resume_job_id=resume_job_id, profile=profiling.should_sample(x_profile))
+        return {
+            "status": "accepted",
+            "job_id": job.job_id,
+            "resumed": job.resumed,
+            "progress_url": f"/api/ingest/jobs/{job.job_id}"
+        }
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No checkpoint found for ingestion job {resume_job_id}")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        return f"Error extracting content from {file_path}: {str(e)}"
+        print(f"Error in ingest endpoint: {e}")
+        raise HTTPException(status_code=500, detail=f"Error starting ingestion: {str(e)}")
+
+@router.get("/ingest/jobs")
+async def list_ingest_jobs():
+    """List ingestion jobs started by this process."""
+    return {"jobs": ingest_service.list_jobs()}
+
+@router.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Progress of an ingestion job: files, chunks and vectors per second."""
+    progress = ingest_service.get_job(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+    return progress
+
+@router.post("/ingest/jobs/{job_id}/cancel")
+async def cancel_ingest_job(job_id: str):
+    """Request cooperative cancellation; the job stops at the next file or batch boundary."""
+    progress = ingest_service.cancel_job(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+    return progress
 
 @router.get("/debug/excel")
 async def debug_excel_extraction():
@@ -268,7 +145,7 @@ async def debug_excel_extraction():
                 print(f"DEBUG: File exists, attempting extraction: {full_path}")
 
                 # Extract content using the same function as ingestion
-                content = _extract_content_simple(full_path, '.xlsx')
+                content = extract_content(full_path, '.xlsx')
 
                 # Check for specific table
                 has_table = 't_h9iy_energy_distribution_pct' in content
@@ -293,6 +170,22 @@ async def debug_excel_extraction():
     except Exception as e:
         return {"error": str(e)}
 
+@router.get("/metrics")
+async def get_metrics():
+    """Per-worker counters and latency summaries, model routing, admission queues and shared cache hit rates."""
+    from core.metrics import metrics
+    from core.shared_cache import shared_cache
+    from services.model_router import model_router
+
+    return {
+        "pid": os.getpid(),
+        **metrics.snapshot(),
+        "models": model_router.snapshot(),
+        "admission": {**{name: controller.snapshot() for name, controller in controllers.items()},
+                      chat_gate.name: chat_gate.snapshot()},
+        "shared_cache": shared_cache.stats()
+    }
+
 @router.get("/health")
 async def health_check():
     """Detailed health check for all services."""
@@ -334,6 +227,10 @@ async def health_check():
                 "error": str(e)
             }
 
+        # Retry, timeout and circuit breaker state per dependency
+        from core.resilience import policies
+        health_status["resilience"] = {name: policy.snapshot() for name, policy in list(policies.items())}
+
         # Overall status
         all_services_ok = all(
             service.get("status") == "connected"
@@ -0,0 +1,211 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+from core.config import settings
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class AdmissionRejected(Exception):
+    """A request was shed instead of queued: the queue is full or its deadline cannot be met."""
+
+    def __init__(self, dependency: str, reason: str, retry_after: int):
+        super().__init__(f"{dependency} is overloaded ({reason}), retry in {retry_after}s")
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+class _Waiter:
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+class AdmissionController:
+    """Caps concurrent calls to one dependency, with a bounded earliest-deadline-first wait queue.
+
+    A freed slot goes to the queued request with the earliest deadline;
+    waiters whose deadline has passed are dropped instead of served late. A
+    request is rejected up front when the queue is full, or when the expected
+    wait (queue position x smoothed service time / concurrency) would overrun
+    its deadline. Limits are per worker process.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, service_time: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.clock = clock
+        self._service_time = service_time
+        self._in_flight = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def check(self, deadline: float = None):
+        """Raise AdmissionRejected now if a request arriving at this moment would be shed."""
+        with self._lock:
+            if self._in_flight < self.max_concurrent and not self._queue:
+                return
+            self._reject_if_overloaded(deadline)
+
+    @contextmanager
+    def slot(self, deadline: float = None, wait: bool = True):
+        """Hold one of the dependency's slots for the enclosed block (queueing until ``deadline`` if needed)."""
+        self._acquire(deadline, wait)
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self._release(self.clock() - started)
+
+    def retry_after(self) -> int:
+        """Seconds a shed caller should wait: the expected wait of a request queued now."""
+        with self._lock:
+            return max(1, math.ceil(self._expected_wait(len(self._queue) + 1)))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._queue),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "service_time": round(self._service_time, 3)
+            }
+
+    def _acquire(self, deadline: Optional[float], wait: bool):
+        arrived = self.clock()
+        with self._lock:
+            if self._in_flight < self.max_concurrent and not self._queue:
+                self._in_flight += 1
+                self._publish()
+                self._admitted(0.0)
+                return
+            if not wait:
+                raise self._rejected("busy")
+            self._reject_if_overloaded(deadline)
+            waiter = _Waiter()
+            heapq.heappush(self._queue, (math.inf if deadline is None else deadline, next(self._sequence), waiter))
+            self._publish()
+
+        waiter.event.wait(None if deadline is None else max(0.0, deadline - self.clock()))
+        with self._lock:
+            if not waiter.granted:
+                self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                heapq.heapify(self._queue)
+                self._publish()
+                raise self._rejected("deadline")
+        self._admitted(self.clock() - arrived)
+
+    def _release(self, service_seconds: float):
+        with self._lock:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_seconds
+            now = self.clock()
+            while self._queue:
+                deadline, _, waiter = heapq.heappop(self._queue)
+                if deadline < now:
+                    # Too late to be useful; wake it so it reports the rejection
+                    waiter.event.set()
+                    continue
+                # Hand the slot over directly, so in_flight stays the same
+                waiter.granted = True
+                waiter.event.set()
+                break
+            else:
+                self._in_flight -= 1
+            self._publish()
+
+    def _reject_if_overloaded(self, deadline: Optional[float]):
+        """Called with the lock held, when no slot is free."""
+        if len(self._queue) >= self.max_queue:
+            raise self._rejected("queue_full")
+        if deadline is not None and self.clock() + self._expected_wait(len(self._queue) + 1) > deadline:
+            raise self._rejected("deadline")
+
+    def _expected_wait(self, position: int) -> float:
+        return position * self._service_time / self.max_concurrent
+
+    def _rejected(self, reason: str) -> AdmissionRejected:
+        metrics.increment(f"admission.{self.name}.rejected.{reason}")
+        retry_after = max(1, math.ceil(self._expected_wait(len(self._queue) + 1)))
+        return AdmissionRejected(self.name, reason, retry_after)
+
+    def _admitted(self, waited: float):
+        metrics.increment(f"admission.{self.name}.admitted")
+        metrics.observe(f"admission.{self.name}.wait", waited)
+
+    def _publish(self):
+        metrics.set_gauge(f"admission.{self.name}.in_flight", self._in_flight)
+        metrics.set_gauge(f"admission.{self.name}.queue_depth", len(self._queue))
+
+class ThreadGate:
+    """Admission for requests handed to worker threads, decided on the event loop.
+
+    Sync work normally goes through anyio's default limiter (40 threads shared
+    by every endpoint), where a burst waits without bound and never reaches
+    an AdmissionController to be shed. The gate admits at most ``capacity``
+    requests at a time and rejects the rest with queue_full right away; its
+    own CapacityLimiter has exactly ``capacity`` tokens, so an admitted
+    request never waits for a thread.
+    """
+
+    def __init__(self, name: str, capacity: int, downstream: AdmissionController):
+        self.name = name
+        self.capacity = capacity
+        self.downstream = downstream
+        self._reserved = 0
+        self._limiter = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def reserve(self):
+        """Hold one of the gate's places for the enclosed block, or raise AdmissionRejected if none is left."""
+        with self._lock:
+            if self._reserved >= self.capacity:
+                metrics.increment(f"admission.{self.name}.rejected.queue_full")
+                raise AdmissionRejected(self.name, "queue_full", self.downstream.retry_after())
+            self._reserved += 1
+            metrics.set_gauge(f"admission.{self.name}.reserved", self._reserved)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved -= 1
+                metrics.set_gauge(f"admission.{self.name}.reserved", self._reserved)
+
+    def limiter(self):
+        """anyio CapacityLimiter for the admitted requests (created lazily: it needs a running event loop)."""
+        if self._limiter is None:
+            import anyio
+            self._limiter = anyio.CapacityLimiter(self.capacity)
+        return self._limiter
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"reserved": self._reserved, "capacity": self.capacity}
+
+def request_deadline() -> float:
+    """Monotonic deadline for a chat request arriving now."""
+    return time.monotonic() + settings.ADMISSION_DEADLINE_SECONDS
+
+# Global instances, one per dependency
+controllers = {
+    "bedrock": AdmissionController("bedrock", settings.BEDROCK_MAX_CONCURRENCY, settings.BEDROCK_MAX_QUEUE,
+                                   service_time=5.0),
+    "retrieval": AdmissionController("retrieval", settings.RETRIEVAL_MAX_CONCURRENCY, settings.RETRIEVAL_MAX_QUEUE,
+                                     service_time=0.5)
+}
+
+# Every chat request waits for at most one retrieval and one Bedrock place (slot or queue entry),
+# so more threads than that would only wait inside the thread pool
+chat_gate = ThreadGate(
+    "chat",
+    settings.BEDROCK_MAX_CONCURRENCY + settings.BEDROCK_MAX_QUEUE + settings.RETRIEVAL_MAX_CONCURRENCY + settings.RETRIEVAL_MAX_QUEUE,
+    controllers["bedrock"]
+)
@@ -1,3 +1,4 @@
+import json
 import os
 from typing import Optional
 from dotenv import load_dotenv
@@ -5,6 +6,21 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+DEFAULT_MODEL_POOL = [
+    {"id": "anthropic.claude-3-haiku-20240307-v1:0", "tier": 1, "expected_latency": 3.0},
+    {"id": "anthropic.claude-3-5-sonnet-20240620-v1:0", "tier": 2, "expected_latency": 10.0}
+]
+
+def _load_model_pool() -> list:
+    """BEDROCK_MODEL_POOL is a JSON list of {"id", "tier", "expected_latency"}; tier 2 = full quality."""
+    raw = os.getenv("BEDROCK_MODEL_POOL")
+    if not raw:
+        return DEFAULT_MODEL_POOL
+    return [
+        {"id": model["id"], "tier": int(model.get("tier", 2)), "expected_latency": float(model.get("expected_latency", 5.0))}
+        for model in json.loads(raw)
+    ]
+
 class Settings:
     # AWS Bedrock
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
@@ -12,10 +28,26 @@ class Settings:
     AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
     BEDROCK_MODEL_ID: str = "anthropic.claude-3-5-sonnet-20240620-v1:0"
 
+    # Embedding profile (see core/embedding_profiles.PROFILES): model, dimension and optional local
+    # projection. Changing the dimension needs a new PINECONE_INDEX_NAME. Quantization is only compared
+    # offline on local indexes (core/embedding_benchmark.py, evaluation/harness.py --quantization)
+    EMBEDDING_PROFILE: str = os.getenv("EMBEDDING_PROFILE", "titan-v1")
+
+    # Model routing: each request goes to the fastest pooled model meeting its class's tier
+    BEDROCK_MODEL_POOL: list = _load_model_pool()
+    ROUTING_SIMPLE_MAX_CHARS: int = int(os.getenv("ROUTING_SIMPLE_MAX_CHARS", "120"))
+    ROUTING_SIMPLE_MIN_SCORE: float = float(os.getenv("ROUTING_SIMPLE_MIN_SCORE", "0.5"))
+    ROUTING_COMPLEX_MIN_CHARS: int = int(os.getenv("ROUTING_COMPLEX_MIN_CHARS", "400"))
+    ROUTING_COMPLEX_MIN_DEPTH: int = int(os.getenv("ROUTING_COMPLEX_MIN_DEPTH", "6"))
+    # How long an idle conversation keeps its turn count (shared by every worker through the shared cache)
+    CONVERSATION_TTL_SECONDS: float = float(os.getenv("CONVERSATION_TTL_SECONDS", "86400"))
+
     # Pinecone
     PINECONE_API_KEY: str = os.getenv("PINECONE_API_KEY", "")
     PINECONE_INDEX_NAME: str = os.getenv("PINECONE_INDEX_NAME", "sostenibilidad-docs")
     PINECONE_ENVIRONMENT: str = os.getenv("PINECONE_ENVIRONMENT", "gcp-starter")
+    SNAPSHOT_WORKERS: int = int(os.getenv("SNAPSHOT_WORKERS", "8"))
+    SNAPSHOT_BATCH_SIZE: int = int(os.getenv("SNAPSHOT_BATCH_SIZE", "100"))
 
     # Document processing - search in multiple directories
     PROJECT_ROOT: str = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
@@ -24,11 +56,93 @@ class Settings:
         os.path.join(PROJECT_ROOT, "docs"),
         PROJECT_ROOT  # Search entire project
     ]
+    # Corpus walker: comma-separated globs relative to each docs root (matched against the path or file name)
+    CORPUS_INCLUDE_GLOBS: list = [g.strip() for g in os.getenv("CORPUS_INCLUDE_GLOBS", "*").split(",") if g.strip()]
+    CORPUS_EXCLUDE_GLOBS: list = [g.strip() for g in os.getenv("CORPUS_EXCLUDE_GLOBS", "~$*,*.tmp,backend/*,frontend/*").split(",") if g.strip()]
+    CORPUS_EXCLUDE_DIRS: list = [d.strip() for d in os.getenv(
+        "CORPUS_EXCLUDE_DIRS",
+        "node_modules,.git,venv,.venv,env,__pycache__,dist,build,.cache,site-packages,.pytest_cache,.idea,.vscode"
+    ).split(",") if d.strip()]
+    CORPUS_MAX_FILE_BYTES: int = int(os.getenv("CORPUS_MAX_FILE_MB", "50")) * 1024 * 1024
+    CORPUS_SKIP_HIDDEN: bool = os.getenv("CORPUS_SKIP_HIDDEN", "true").lower() == "true"
     # Backward compatibility
     DOCS_PATH: str = os.path.join(PROJECT_ROOT, "documentos")
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
 
+    # Retrieval: over-fetch, then MMR re-rank with a score cutoff (k adapts per query)
+    RETRIEVAL_K: int = int(os.getenv("RETRIEVAL_K", "3"))
+    RETRIEVAL_MIN_K: int = int(os.getenv("RETRIEVAL_MIN_K", "1"))
+    RETRIEVAL_FETCH_K: int = int(os.getenv("RETRIEVAL_FETCH_K", "12"))
+    RETRIEVAL_MMR_LAMBDA: float = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5"))
+    RETRIEVAL_SCORE_THRESHOLD: float = float(os.getenv("RETRIEVAL_SCORE_THRESHOLD", "0.3"))
+    # Two-stage retrieval: rank source files by their summary vector (written at ingest),
+    # then search only the chunks of the top documents
+    HIERARCHICAL_RETRIEVAL: bool = os.getenv("HIERARCHICAL_RETRIEVAL", "false").lower() == "true"
+    HIERARCHICAL_TOP_DOCS: int = int(os.getenv("HIERARCHICAL_TOP_DOCS", "5"))
+
+    # Speculative retrieval for drafts sent to /api/prefetch while the user types
+    PREFETCH_ENABLED: bool = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+    PREFETCH_MIN_CHARS: int = int(os.getenv("PREFETCH_MIN_CHARS", "12"))
+    PREFETCH_WORKERS: int = int(os.getenv("PREFETCH_WORKERS", "4"))
+
+    # Extraction cache (extracted text + chunk boundaries, keyed by file fingerprint)
+    BACKEND_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    EXTRACTION_CACHE_ENABLED: bool = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+    EXTRACTION_CACHE_DIR: str = os.getenv("EXTRACTION_CACHE_DIR", os.path.join(BACKEND_ROOT, ".cache", "extraction"))
+    EXTRACTION_CACHE_MAX_BYTES: int = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+    # Background ingestion jobs
+    INGEST_CHECKPOINT_DIR: str = os.getenv("INGEST_CHECKPOINT_DIR", os.path.join(BACKEND_ROOT, ".cache", "ingest_jobs"))
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+    # Estimated Jaccard similarity above which a chunk with the same numbers as an earlier one is
+    # dropped as a near duplicate (above 1 disables near-duplicate removal; exact ones are always dropped)
+    DEDUP_NEAR_THRESHOLD: float = float(os.getenv("DEDUP_NEAR_THRESHOLD", "0.9"))
+
+    # Shared cross-worker cache (SQLite in WAL mode, one file per host)
+    SHARED_CACHE_ENABLED: bool = os.getenv("SHARED_CACHE_ENABLED", "true").lower() == "true"
+    SHARED_CACHE_PATH: str = os.getenv("SHARED_CACHE_PATH", os.path.join(BACKEND_ROOT, ".cache", "shared_cache.sqlite3"))
+    SHARED_CACHE_MAX_BYTES: int = int(os.getenv("SHARED_CACHE_MAX_MB", "256")) * 1024 * 1024
+    EMBEDDING_CACHE_TTL_SECONDS: float = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    RETRIEVAL_CACHE_TTL_SECONDS: float = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "300"))
+    NAMESPACE_CACHE_TTL_SECONDS: float = float(os.getenv("NAMESPACE_CACHE_TTL_SECONDS", "60"))
+
+    # Resilience: per-dependency timeouts, jittered retries, circuit breakers and hedging
+    # (a hedge delay of 0 disables hedging for that dependency)
+    BEDROCK_TIMEOUT_SECONDS: float = float(os.getenv("BEDROCK_TIMEOUT_SECONDS", "60"))
+    BEDROCK_MAX_ATTEMPTS: int = int(os.getenv("BEDROCK_MAX_ATTEMPTS", "3"))
+    EMBEDDING_TIMEOUT_SECONDS: float = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "5"))
+    EMBEDDING_BATCH_TIMEOUT_SECONDS: float = float(os.getenv("EMBEDDING_BATCH_TIMEOUT_SECONDS", "120"))
+    EMBEDDING_MAX_ATTEMPTS: int = int(os.getenv("EMBEDDING_MAX_ATTEMPTS", "3"))
+    EMBEDDING_HEDGE_AFTER_SECONDS: float = float(os.getenv("EMBEDDING_HEDGE_AFTER_SECONDS", "0"))
+    PINECONE_TIMEOUT_SECONDS: float = float(os.getenv("PINECONE_TIMEOUT_SECONDS", "5"))
+    PINECONE_UPSERT_TIMEOUT_SECONDS: float = float(os.getenv("PINECONE_UPSERT_TIMEOUT_SECONDS", "30"))
+    PINECONE_MAX_ATTEMPTS: int = int(os.getenv("PINECONE_MAX_ATTEMPTS", "3"))
+    PINECONE_HEDGE_AFTER_SECONDS: float = float(os.getenv("PINECONE_HEDGE_AFTER_SECONDS", "0"))
+    RETRY_BACKOFF_BASE_SECONDS: float = float(os.getenv("RETRY_BACKOFF_BASE_SECONDS", "0.2"))
+    RETRY_BACKOFF_MAX_SECONDS: float = float(os.getenv("RETRY_BACKOFF_MAX_SECONDS", "5"))
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_SECONDS: float = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+    # Worker threads per dependency policy; a stalled dependency can only tie up its own
+    RESILIENCE_WORKERS_PER_DEPENDENCY: int = int(os.getenv("RESILIENCE_WORKERS_PER_DEPENDENCY", "16"))
+
+    # Admission control: per-dependency concurrency limits with a bounded earliest-deadline-first
+    # queue (per worker); /api/chat requests that cannot start before their deadline get 429/503
+    ADMISSION_DEADLINE_SECONDS: float = float(os.getenv("ADMISSION_DEADLINE_SECONDS", "30"))
+    BEDROCK_MAX_CONCURRENCY: int = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "8"))
+    BEDROCK_MAX_QUEUE: int = int(os.getenv("BEDROCK_MAX_QUEUE", "16"))
+    RETRIEVAL_MAX_CONCURRENCY: int = int(os.getenv("RETRIEVAL_MAX_CONCURRENCY", "8"))
+    RETRIEVAL_MAX_QUEUE: int = int(os.getenv("RETRIEVAL_MAX_QUEUE", "16"))
+
+    # Profiling: opt-in sampling profiler for /api/chat and /api/ingest (X-Profile: 1 header or
+    # a sampling rate), plus a log of per-stage timings for every request slower than the threshold
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_INTERVAL_SECONDS: float = float(os.getenv("PROFILING_INTERVAL_SECONDS", "0.005"))
+    PROFILING_DIR: str = os.getenv("PROFILING_DIR", os.path.join(BACKEND_ROOT, ".cache", "profiles"))
+    PROFILING_MAX_FILES: int = int(os.getenv("PROFILING_MAX_FILES", "200"))
+    SLOW_REQUEST_SECONDS: float = float(os.getenv("SLOW_REQUEST_SECONDS", "10"))
+
     # API
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
 
@@ -0,0 +1,137 @@
+"""Compare embedding profiles and quantizations on our corpus: recall@k, index memory and query latency.
+
+Works from an index snapshot (core.snapshot), so the reference vectors cost
+nothing to load. Profiles derived from the snapshot's model (e.g. the
+projected titan-v1 profiles) are computed locally; profiles using another
+model re-embed the chunk texts through Bedrock (use ``--limit`` to bound
+the cost). Recall@k is measured against exact float32 search with the
+snapshot vectors. Without ``--queries``, randomly sampled chunks act as
+queries (their own match is excluded).
+
+Usage (from the backend directory)::
+
+    python -m core.embedding_benchmark snapshots/2025-01-01 --k 3
+    python -m core.embedding_benchmark snapshots/2025-01-01 --profiles titan-v1,titan-v2-256 --limit 2000
+"""
+import argparse
+import json
+import logging
+import time
+import numpy as np
+from core.embedding_profiles import PROFILES, QUANTIZATIONS, bedrock_embeddings, get_profile
+from core.local_index import LocalVectorIndex
+from core.retrieval import SUMMARY_NAMESPACE
+from core.resilience import policies
+from core.snapshot import load_manifest
+
+logger = logging.getLogger(__name__)
+
+def run_benchmark(directory: str, profile_names: list[str], quantizations: list[str], k: int = 3,
+                  queries: list[str] = None, sample: int = 200, limit: int = None, seed: int = 0) -> list[dict]:
+    """One result row per (profile, quantization)."""
+    manifest = load_manifest(directory)
+    # Per-file summary vectors are not chunks; they would skew recall and bytes per vector
+    reference = LocalVectorIndex.from_snapshot(directory, exclude_namespaces=(SUMMARY_NAMESPACE,))
+    if limit:
+        reference = _truncated(reference, limit)
+    texts = [meta.get("text", "") for meta in reference.metadatas]
+    reference_model = manifest.get("embedding_model")
+
+    base_vectors = reference.vectors()
+    if queries:
+        query_texts = queries
+        query_ids = [None] * len(queries)
+        reference_queries = _embed(get_profile(manifest.get("embedding_profile", "titan-v1")), query_texts, query=True)
+    else:
+        picks = np.random.default_rng(seed).choice(len(reference.ids), size=min(sample, len(reference.ids)), replace=False)
+        query_texts = [texts[i] for i in picks]
+        query_ids = [reference.ids[i] for i in picks]
+        reference_queries = base_vectors[picks]
+    truth = [_top_ids(reference, vector, k, exclude) for vector, exclude in zip(reference_queries, query_ids)]
+
+    results = []
+    for name in profile_names:
+        profile = get_profile(name)
+        if profile.model_id == reference_model and profile.model_dimension == base_vectors.shape[1]:
+            vectors = profile.project(base_vectors)
+            query_vectors = profile.project(reference_queries)
+        else:
+            logger.info(f"Re-embedding {len(texts)} chunks with {profile.model_id} for profile {name}")
+            vectors = _embed(profile, texts)
+            query_vectors = _embed(profile, query_texts, query=True)
+
+        for quantization in quantizations:
+            index = LocalVectorIndex(profile.dimension, quantization)
+            index.add(reference.ids, vectors, reference.metadatas, reference.namespaces)
+            latencies = []
+            recalls = []
+            for vector, exclude, expected in zip(query_vectors, query_ids, truth):
+                started = time.perf_counter()
+                found = _top_ids(index, vector, k, exclude)
+                latencies.append(time.perf_counter() - started)
+                recalls.append(len(set(found) & set(expected)) / max(len(expected), 1))
+            results.append({
+                "profile": name,
+                "model": profile.model_id,
+                "quantization": quantization,
+                "dimension": profile.dimension,
+                "vectors": len(index.ids),
+                "queries": len(query_vectors),
+                f"recall_at_{k}": round(float(np.mean(recalls)), 4),
+                "index_bytes": index.memory_bytes(),
+                "bytes_per_vector": round(index.memory_bytes() / max(len(index.ids), 1), 1),
+                "query_ms_p50": round(float(np.percentile(latencies, 50)) * 1000, 3),
+                "query_ms_p95": round(float(np.percentile(latencies, 95)) * 1000, 3)
+            })
+            logger.info(json.dumps(results[-1]))
+    return results
+
+def _top_ids(index: LocalVectorIndex, vector, k: int, exclude: str = None) -> list[str]:
+    matches = index.query(vector, top_k=k + (1 if exclude else 0), include_metadata=False)["matches"]
+    return [match["id"] for match in matches if match["id"] != exclude][:k]
+
+def _embed(profile, texts: list[str], query: bool = False, batch_size: int = 32) -> np.ndarray:
+    embeddings = bedrock_embeddings(profile)
+    vectors = []
+    if query:
+        for text in texts:
+            vectors.append(policies["embed_query"].call(embeddings.embed_query, text))
+    else:
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(policies["embed_documents"].call(embeddings.embed_documents, texts[start:start + batch_size]))
+    return profile.project(np.asarray(vectors, dtype=np.float32))
+
+def _truncated(index: LocalVectorIndex, limit: int) -> LocalVectorIndex:
+    smaller = LocalVectorIndex(index.dimension)
+    smaller.add(index.ids[:limit], index.vectors()[:limit], index.metadatas[:limit], index.namespaces[:limit])
+    return smaller
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding profiles and quantizations on an index snapshot.")
+    parser.add_argument("snapshot")
+    parser.add_argument("--profiles", default="titan-v1,titan-v1-proj512,titan-v1-proj256",
+                        help=f"Comma-separated, from: {', '.join(PROFILES)}")
+    parser.add_argument("--quantizations", default=",".join(QUANTIZATIONS))
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", help="File with one query per line (embedded through Bedrock)")
+    parser.add_argument("--sample", type=int, default=200, help="Sampled chunk queries when --queries is not given")
+    parser.add_argument("--limit", type=int, help="Use only the first N snapshot vectors")
+    parser.add_argument("--output", help="Also write the JSONL results here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    queries = None
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    results = run_benchmark(args.snapshot, args.profiles.split(","), args.quantizations.split(","), k=args.k,
+                            queries=queries, sample=args.sample, limit=args.limit)
+    lines = [json.dumps(result, ensure_ascii=False) for result in results]
+    print("\n".join(lines))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+if __name__ == "__main__":
+    main()
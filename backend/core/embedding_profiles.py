@@ -0,0 +1,119 @@
+import numpy as np
+from core.config import settings
+
+TITAN_V1 = "amazon.titan-embed-text-v1"
+TITAN_V2 = "amazon.titan-embed-text-v2:0"
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+class EmbeddingProfile:
+    """Which Bedrock model produces the vectors, at what dimension, and how local copies are stored.
+
+    ``model_kwargs`` are passed through to the Bedrock body (Titan v2 takes
+    ``dimensions`` of 256/512/1024). A profile with ``projection_dim`` embeds
+    with the model and then applies a fixed, seeded random orthonormal
+    projection, so vectors shrink without switching models; projected vectors
+    are re-normalized so cosine scores stay comparable. ``quantization``
+    describes how a local index (benchmark, evaluation) stores the vectors;
+    query vectors sent to Pinecone and cached are always full float32.
+    """
+
+    def __init__(self, name: str, model_id: str, dimension: int, model_kwargs: dict = None,
+                 projection_dim: int = None, quantization: str = "none", seed: int = 7):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+        self.name = name
+        self.model_id = model_id
+        self.model_dimension = dimension
+        self.model_kwargs = model_kwargs or {}
+        self.projection_dim = projection_dim
+        self.quantization = quantization
+        self.seed = seed
+        self._projection = None
+
+    @property
+    def dimension(self) -> int:
+        """Dimension of the vectors stored in the index."""
+        return self.projection_dim or self.model_dimension
+
+    def with_quantization(self, quantization: str) -> "EmbeddingProfile":
+        return EmbeddingProfile(self.name, self.model_id, self.model_dimension, self.model_kwargs,
+                                self.projection_dim, quantization, self.seed)
+
+    def transform(self, vectors):
+        """Project model output (one vector or a list of them) to the profile dimension; no-op without a projection."""
+        if not self.projection_dim:
+            return vectors
+        matrix = np.asarray(vectors, dtype=np.float32)
+        projected = self.project(np.atleast_2d(matrix))
+        return projected[0].tolist() if matrix.ndim == 1 else projected.tolist()
+
+    def project(self, matrix: np.ndarray) -> np.ndarray:
+        """Row-wise projection of a float32 matrix of model-dimension vectors, re-normalized."""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if not self.projection_dim:
+            return matrix
+        projected = matrix @ self._projection_matrix()
+        projected /= np.maximum(np.linalg.norm(projected, axis=1, keepdims=True), 1e-12)
+        return projected
+
+    def _projection_matrix(self) -> np.ndarray:
+        if self._projection is None:
+            rng = np.random.default_rng(self.seed)
+            gaussian = rng.standard_normal((self.model_dimension, self.projection_dim)).astype(np.float32)
+            # Orthonormal columns preserve inner products better than a raw Gaussian projection
+            self._projection, _ = np.linalg.qr(gaussian)
+        return self._projection
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 codes and float32 scales (vector ~= codes * scale)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits packed 8 per byte (dimension / 32 the size of float32)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return np.packbits(vectors > 0, axis=1)
+
+# Bits set in every byte value, for Hamming distance on packed codes
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+def hamming_similarity(query_bits: np.ndarray, codes: np.ndarray, dimension: int) -> np.ndarray:
+    """1 - normalized Hamming distance between one packed query and every packed code."""
+    distances = _POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+    return 1.0 - distances / float(dimension)
+
+PROFILES = {
+    profile.name: profile for profile in (
+        EmbeddingProfile("titan-v1", TITAN_V1, 1536),
+        EmbeddingProfile("titan-v1-proj512", TITAN_V1, 1536, projection_dim=512),
+        EmbeddingProfile("titan-v1-proj256", TITAN_V1, 1536, projection_dim=256),
+        EmbeddingProfile("titan-v2-1024", TITAN_V2, 1024, {"dimensions": 1024, "normalize": True}),
+        EmbeddingProfile("titan-v2-512", TITAN_V2, 512, {"dimensions": 512, "normalize": True}),
+        EmbeddingProfile("titan-v2-256", TITAN_V2, 256, {"dimensions": 256, "normalize": True}),
+    )
+}
+
+def bedrock_embeddings(profile: EmbeddingProfile):
+    """LangChain Bedrock embeddings client for a profile's model (projection is applied separately)."""
+    from langchain_aws import BedrockEmbeddings
+    return BedrockEmbeddings(
+        model_id=profile.model_id,
+        model_kwargs=profile.model_kwargs or None,
+        region_name=settings.AWS_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+    )
+
+def get_profile(name: str, quantization: str = "none") -> EmbeddingProfile:
+    if name not in PROFILES:
+        raise ValueError(f"Unknown embedding profile {name!r}, expected one of {sorted(PROFILES)}")
+    return PROFILES[name].with_quantization(quantization)
+
+# Global instance
+embedding_profile = get_profile(settings.EMBEDDING_PROFILE)
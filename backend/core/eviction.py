@@ -0,0 +1,18 @@
+from typing import Iterable
+
+def eviction_victims(entries: Iterable[tuple], total_bytes: int, max_bytes: int, low_water: float = 0.9) -> list:
+    """Items to evict, in the order given, once ``total_bytes`` exceeds ``max_bytes``.
+
+    ``entries`` are ``(size, item)`` pairs, least valuable first. Evicts down to
+    ``low_water`` of the cap so a full cache doesn't evict on every write.
+    """
+    if total_bytes <= max_bytes:
+        return []
+    target = int(max_bytes * low_water)
+    victims = []
+    for size, item in entries:
+        if total_bytes <= target:
+            break
+        victims.append(item)
+        total_bytes -= size
+    return victims
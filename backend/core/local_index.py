@@ -0,0 +1,145 @@
+import json
+import os
+import numpy as np
+from core.embedding_profiles import quantize_int8, dequantize_int8, quantize_binary, hamming_similarity
+from core.retrieval import SUMMARY_NAMESPACE
+
+class LocalVectorIndex:
+    """In-memory cosine index over numpy arrays, stored as float32, int8 or packed sign bits.
+
+    Used offline (benchmarks, evaluation) as a stand-in for Pinecone; it
+    mirrors ``index.query`` closely enough to run core.retrieval's search
+    functions on it: namespaces, ``{"field": {"$in": [...]}}`` metadata
+    filters, and matches with ``id``, ``score``, ``metadata`` and optionally
+    ``values``.
+    """
+
+    def __init__(self, dimension: int, quantization: str = "none"):
+        self.dimension = dimension
+        self.quantization = quantization
+        self.ids = []
+        self.namespaces = []
+        self.metadatas = []
+        self._code_chunks = []
+        self._scale_chunks = []
+        self._codes = None
+        self._scales = None
+
+    @classmethod
+    def from_snapshot(cls, directory: str, quantization: str = "none", project=None,
+                      exclude_namespaces: tuple = ()) -> "LocalVectorIndex":
+        """Load a snapshot written by core.snapshot (optionally re-projecting its vectors, e.g. EmbeddingProfile.project)."""
+        embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "metadata.jsonl"), "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        if exclude_namespaces:
+            keep = [i for i, row in enumerate(rows) if row["namespace"] not in exclude_namespaces]
+            rows = [rows[i] for i in keep]
+            embeddings = embeddings[keep]
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if project is not None:
+            vectors = project(vectors)
+        index = cls(vectors.shape[1], quantization)
+        index.add([row["id"] for row in rows], vectors, [row["metadata"] for row in rows],
+                  namespaces=[row["namespace"] for row in rows])
+        return index
+
+    def add(self, ids: list[str], vectors, metadatas: list[dict] = None, namespaces: list[str] = None):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected dimension {self.dimension}, got {vectors.shape[1]}")
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self.ids.extend(ids)
+        self.metadatas.extend(metadatas or [{} for _ in ids])
+        self.namespaces.extend(namespaces or ["" for _ in ids])
+        # Only the stored form is kept, as a real deployment would
+        if self.quantization == "int8":
+            codes, scales = quantize_int8(vectors)
+            self._scale_chunks.append(scales)
+        elif self.quantization == "binary":
+            codes = quantize_binary(vectors)
+        else:
+            codes = vectors
+        self._code_chunks.append(codes)
+        self._codes = None
+
+    def query(self, vector, top_k: int = 10, namespace: str = None, filter: dict = None,
+              include_metadata: bool = True, include_values: bool = False) -> dict:
+        """Top-k matches by cosine similarity (approximate for int8/binary storage)."""
+        self._build()
+        if not self.ids:
+            return {"matches": []}
+        scores = self._scores(np.asarray(vector, dtype=np.float32))
+        mask = self._mask(namespace, filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        top_k = min(top_k, len(self.ids))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        matches = []
+        for i in best:
+            if not np.isfinite(scores[i]):
+                break
+            match = {"id": self.ids[i], "score": float(scores[i])}
+            if include_metadata:
+                match["metadata"] = self.metadatas[i]
+            if include_values:
+                match["values"] = self._vector(i).tolist()
+            matches.append(match)
+        return {"matches": matches}
+
+    def list_namespaces(self) -> list[str]:
+        """Chunk namespaces, as the guarded Pinecone index lists them (summaries excluded)."""
+        return sorted(set(self.namespaces) - {SUMMARY_NAMESPACE})
+
+    def vectors(self) -> np.ndarray:
+        """All stored vectors as float32 rows (reconstructed from the codes when quantized)."""
+        self._build()
+        if self._codes is None:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        if self.quantization == "int8":
+            return dequantize_int8(self._codes, self._scales)
+        if self.quantization == "binary":
+            return np.unpackbits(self._codes, axis=1)[:, :self.dimension].astype(np.float32) * 2 - 1
+        return self._codes
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the vector storage (codes plus scales), excluding ids and metadata."""
+        self._build()
+        if self._codes is None:
+            return 0
+        return self._codes.nbytes + (self._scales.nbytes if self._scales is not None else 0)
+
+    def _build(self):
+        if self._codes is not None or not self._code_chunks:
+            return
+        self._code_chunks = [np.concatenate(self._code_chunks)]
+        self._codes = self._code_chunks[0]
+        if self._scale_chunks:
+            self._scale_chunks = [np.concatenate(self._scale_chunks)]
+            self._scales = self._scale_chunks[0]
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        if self.quantization == "int8":
+            return (self._codes @ query) * self._scales
+        if self.quantization == "binary":
+            return hamming_similarity(quantize_binary(query)[0], self._codes, self.dimension)
+        return self._codes @ query
+
+    def _vector(self, i: int) -> np.ndarray:
+        if self.quantization == "int8":
+            return dequantize_int8(self._codes[i:i + 1], self._scales[i:i + 1])[0]
+        if self.quantization == "binary":
+            return np.unpackbits(self._codes[i])[:self.dimension].astype(np.float32) * 2 - 1
+        return self._codes[i]
+
+    def _mask(self, namespace: str, metadata_filter: dict):
+        mask = None
+        if namespace is not None:
+            mask = np.fromiter((ns == namespace for ns in self.namespaces), dtype=bool, count=len(self.ids))
+        for field, condition in (metadata_filter or {}).items():
+            allowed = set(condition["$in"]) if isinstance(condition, dict) else {condition}
+            field_mask = np.fromiter((meta.get(field) in allowed for meta in self.metadatas), dtype=bool, count=len(self.ids))
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
@@ -0,0 +1,57 @@
+import threading
+from collections import defaultdict, deque
+
+class Metrics:
+    """In-process counters and latency summaries, exposed at /api/metrics.
+
+    Metric names carry their labels inline (e.g. ``chat.model.<model_id>``) to
+    keep this dependency-free; values are per worker process.
+    """
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._gauges = {}
+        self._timings = {}
+
+    def increment(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = {"count": 0, "sum": 0.0, "max": 0.0, "recent": deque(maxlen=self.window)}
+            timing["count"] += 1
+            timing["sum"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+            timing["recent"].append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {}
+            for name, timing in self._timings.items():
+                recent = sorted(timing["recent"])
+                timings[name] = {
+                    "count": timing["count"],
+                    "avg": round(timing["sum"] / timing["count"], 4),
+                    "max": round(timing["max"], 4),
+                    "p50": round(_percentile(recent, 0.50), 4),
+                    "p95": round(_percentile(recent, 0.95), 4),
+                    "p99": round(_percentile(recent, 0.99), 4)
+                }
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges), "timings": timings}
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+# Global instance
+metrics = Metrics()
@@ -0,0 +1,228 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Optional
+from core.config import settings
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+
+class RequestProfile:
+    """Per-stage timings and sizes of one request, plus an optional sampling profiler.
+
+    The active profile lives in a context variable, so ``stage()`` calls
+    anywhere below the request (including resilience executor threads, which
+    copy the context) add to it. Threads that enter a stage are registered so
+    the sampler follows the work off the event loop.
+    """
+
+    def __init__(self, name: str, sample: bool = False):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.sizes = {}
+        self.threads = {threading.get_ident()}
+        self.sampler = SamplingProfiler(self.threads, settings.PROFILING_INTERVAL_SECONDS) if sample else None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> dict:
+        return {
+            "name": self.name,
+            "seconds": round(self.elapsed(), 4),
+            "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+            "sizes": dict(self.sizes)
+        }
+
+class SamplingProfiler:
+    """Samples the stacks of a set of threads at a fixed interval into collapsed-stack counts.
+
+    Output uses the ``frame;frame;frame count`` format read by flamegraph.pl
+    and speedscope. Only the registered threads are sampled, so other requests
+    running on the pool show up only if they share the event loop.
+    """
+
+    def __init__(self, threads: set, interval: float = 0.005):
+        self.threads = threads
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.threads):
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_profile", default=None)
+
+def current() -> Optional[RequestProfile]:
+    return _current.get()
+
+def should_sample(header_value: Optional[str]) -> bool:
+    """Sample when profiling is enabled and the request asks for it or wins the sampling draw."""
+    if not settings.PROFILING_ENABLED:
+        return False
+    if header_value is not None and header_value.lower() in ("1", "true", "yes"):
+        return True
+    return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+@contextmanager
+def profile_request(name: str, sample: bool = False):
+    """Make a RequestProfile current for the enclosed block and start its sampler if requested."""
+    profile = RequestProfile(name, sample=sample)
+    token = _current.set(profile)
+    if profile.sampler:
+        profile.sampler.start()
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+        if profile.sampler:
+            profile.sampler.stop()
+
+@contextmanager
+def stage(name: str):
+    """Add the enclosed block's wall time to the current request's stage timings (no-op outside a request)."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile.threads.add(threading.get_ident())
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.stages[name] += time.perf_counter() - started
+
+def add_stage(name: str, seconds: float):
+    """Add an externally measured duration to the current request's stage timings."""
+    profile = _current.get()
+    if profile is not None:
+        profile.stages[name] += seconds
+
+def record_size(name: str, value: int):
+    profile = _current.get()
+    if profile is not None:
+        profile.sizes[name] = value
+
+def finish(profile: RequestProfile) -> Optional[str]:
+    """Record stage timings, save the sampled profile (if any) and log the request if it was slow."""
+    for name, seconds in profile.stages.items():
+        metrics.observe(f"stage.{name}", seconds)
+    profile_id = save(profile)
+    if settings.SLOW_REQUEST_SECONDS > 0 and profile.elapsed() >= settings.SLOW_REQUEST_SECONDS:
+        metrics.increment("requests.slow")
+        logger.warning(f"Slow request: {json.dumps({**profile.summary(), 'profile_id': profile_id})}")
+    return profile_id
+
+def save(profile: RequestProfile) -> Optional[str]:
+    """Write collapsed stacks and the stage summary to PROFILING_DIR; return the profile id."""
+    if profile.sampler is None:
+        return None
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{profile.name}-{uuid.uuid4().hex[:8]}"
+    try:
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        base = os.path.join(settings.PROFILING_DIR, profile_id)
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, count in profile.sampler.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({**profile.summary(), "samples": sum(profile.sampler.samples.values()),
+                       "interval": profile.sampler.interval}, f, indent=2)
+        _prune(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
+    except OSError as e:
+        logger.warning(f"Could not save profile {profile_id}: {e}")
+        return None
+    logger.info(f"Saved profile {profile_id} to {settings.PROFILING_DIR}")
+    return profile_id
+
+class ProfilingMiddleware:
+    """ASGI middleware timing the stages of requests to ``paths`` and sampling a profile when asked.
+
+    A sampled request (X-Profile header or PROFILING_SAMPLE_RATE) gets its
+    profile id in the X-Profile-Id response header. Plain ASGI rather than
+    ``@app.middleware("http")``, so other requests pass straight through
+    without having their responses re-wrapped.
+    """
+
+    def __init__(self, app, paths: set):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        sample = should_sample(headers.get(PROFILE_HEADER.lower()))
+        finished = False
+
+        with profile_request(scope["path"].rsplit("/", 1)[-1], sample=sample) as profile:
+            record_size("request_bytes", int(headers.get("content-length") or 0))
+
+            def close() -> Optional[str]:
+                nonlocal finished
+                finished = True
+                if profile.sampler:
+                    profile.sampler.stop()
+                return finish(profile)
+
+            async def send_with_profile_id(message):
+                # The handler is done once the response starts, so the profile can be closed and its id sent
+                if message["type"] == "http.response.start" and not finished:
+                    profile_id = close()
+                    if profile_id:
+                        message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode("latin-1"))]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_profile_id)
+            finally:
+                if not finished:
+                    close()
+
+def _prune(directory: str, max_profiles: int):
+    """Keep only the newest max_profiles profiles, removing each old profile's .collapsed and .json together."""
+    newest = {}
+    for entry in os.scandir(directory):
+        profile_id, extension = os.path.splitext(entry.name)
+        if extension in (".collapsed", ".json"):
+            newest[profile_id] = max(newest.get(profile_id, 0.0), entry.stat().st_mtime)
+    for profile_id in sorted(newest, key=newest.get, reverse=True)[max_profiles:]:
+        for extension in (".collapsed", ".json"):
+            try:
+                os.remove(os.path.join(directory, profile_id + extension))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove old profile {profile_id}: {e}")
@@ -0,0 +1,294 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FutureTimeoutError, wait
+from typing import Callable, Optional
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Connection failures raised by botocore and urllib3 (used by Pinecone), matched by class name
+# so neither library is imported here
+_CONNECTION_ERRORS = {"EndpointConnectionError", "ConnectTimeoutError", "ReadTimeoutError", "ConnectionClosedError",
+                      "NewConnectionError", "MaxRetryError", "ProtocolError"}
+_TIMEOUT_ERRORS = {"ReadTimeoutError"}
+
+class DependencyTimeout(Exception):
+    """A call to an external dependency exceeded its timeout."""
+
+class DependencyBusy(Exception):
+    """Every worker thread of the dependency is still busy (e.g. with timed-out calls); the call was not attempted."""
+
+class CircuitOpenError(Exception):
+    """The dependency's circuit breaker is open; the call was not attempted."""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial call."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Whether a call now would be rejected, without changing state (an open circuit past reset_timeout is not)."""
+        with self._lock:
+            if self.state == "open":
+                return self.clock() - self.opened_at < self.reset_timeout
+            return self.state == "half_open" and self._trial_in_flight
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit {self.name} closed")
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = self.clock()
+                self._trial_in_flight = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+def is_retryable(error: Exception) -> bool:
+    """Retry timeouts, throttling, 5xx and connection errors; never client (4xx) errors or bugs in our code."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (DependencyTimeout, DependencyBusy)):
+        return True
+
+    # botocore ClientError
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code", "")
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if "Throttl" in code or code in ("ServiceUnavailableException", "ModelNotReadyException",
+                                          "ModelTimeoutException", "InternalServerException"):
+            return True
+        if isinstance(status, int):
+            return status == 429 or status >= 500
+
+    # Pinecone / HTTP client errors expose a numeric status
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+
+    return isinstance(error, (ConnectionError, TimeoutError)) or _named(error, _CONNECTION_ERRORS)
+
+def is_timeout(error: Exception) -> bool:
+    """The call may still be running on the dependency's side (our timeout, or the client's read timeout)."""
+    return isinstance(error, (DependencyTimeout, TimeoutError)) or _named(error, _TIMEOUT_ERRORS)
+
+def _named(error: Exception, names: set) -> bool:
+    return any(cls.__name__ in names for cls in type(error).__mro__)
+
+class ResiliencePolicy:
+    """Timeout, jittered retries, circuit breaking and optional hedging for one dependency.
+
+    ``hedge_after`` (seconds) should only be set for cheap, idempotent calls: if
+    the first attempt has not answered by then, a duplicate is fired and
+    whichever finishes first wins. Set ``retry_timeouts=False`` for calls that
+    must not run twice (a Bedrock generation is paid for even if abandoned).
+
+    Attempts run on the policy's own pool of ``max_workers`` threads, so a
+    stalled dependency can only tie up its own threads. A timed-out attempt
+    keeps its thread until the client's own timeout ends it; when every
+    thread is taken, calls fail fast with DependencyBusy instead of queueing
+    (which would also eat into their timeout).
+    """
+
+    def __init__(self, name: str, timeout: float, max_attempts: int = 3, backoff_base: float = 0.2,
+                 backoff_max: float = 5.0, hedge_after: Optional[float] = None,
+                 breaker: CircuitBreaker = None, retryable: Callable[[Exception], bool] = is_retryable,
+                 sleep: Callable[[float], None] = time.sleep, rng: random.Random = None,
+                 max_workers: int = 8, retry_timeouts: bool = True):
+        self.name = name
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after if hedge_after and hedge_after > 0 else None
+        self.breaker = breaker or CircuitBreaker(name)
+        self.retryable = retryable
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.max_workers = max_workers
+        self.retry_timeouts = retry_timeouts
+        self.stats = {"calls": 0, "retries": 0, "timeouts": 0, "failures": 0, "rejected": 0, "busy": 0,
+                      "hedges": 0, "hedge_wins": 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"resilience-{name}")
+        self._busy_workers = 0
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) under this policy, raising the last error if every attempt fails."""
+        self._count("calls")
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)") from last_error
+
+            try:
+                result = self._attempt(fn, args, kwargs)
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                last_error = e
+                retryable = self.retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    # The dependency answered; a bad request says nothing about its health
+                    self.breaker.record_success()
+                if not self.retry_timeouts and is_timeout(e):
+                    # The abandoned call may still complete; running it again would do the work twice
+                    retryable = False
+                if attempt == self.max_attempts or not retryable:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                delay = self._backoff(attempt)
+                logger.warning(f"{self.name} attempt {attempt} failed ({e}); retrying in {delay:.2f}s")
+                self.sleep(delay)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            busy_workers = self._busy_workers
+        return {**stats, "busy_workers": busy_workers, "circuit": self.breaker.snapshot()}
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _submit(self, fn: Callable, args, kwargs):
+        """Start an attempt on a free worker thread, or raise DependencyBusy if there is none."""
+        with self._lock:
+            if self._busy_workers >= self.max_workers:
+                self.stats["busy"] += 1
+                raise DependencyBusy(f"{self.name}: all {self.max_workers} workers are busy")
+            self._busy_workers += 1
+        # Run in a copy of the caller's context so per-request state (e.g. profiling stages) follows the call
+        future = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        future.add_done_callback(self._worker_done)
+        return future
+
+    def _worker_done(self, _future):
+        with self._lock:
+            self._busy_workers -= 1
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+        return self.rng.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _attempt(self, fn: Callable, args, kwargs):
+        # A running thread cannot be cancelled: on timeout the attempt is abandoned and its thread
+        # stays counted as busy until the client's own timeout (e.g. botocore read_timeout) ends it
+        primary = self._submit(fn, args, kwargs)
+        if self.hedge_after is None or self.hedge_after >= self.timeout:
+            try:
+                return primary.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                self._count("timeouts")
+                raise DependencyTimeout(f"{self.name} timed out after {self.timeout}s")
+
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        try:
+            hedge = self._submit(fn, args, kwargs)
+            self._count("hedges")
+            pending = {primary, hedge}
+        except DependencyBusy:
+            # No thread to spare for a duplicate; keep waiting for the primary
+            hedge = None
+            pending = {primary}
+        deadline = time.monotonic() + self.timeout - self.hedge_after
+        last_error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                last_error = future.exception()
+
+        if last_error is not None and not pending:
+            raise last_error
+        self._count("timeouts")
+        raise DependencyTimeout(f"{self.name} timed out after {self.timeout}s")
+
+def _policy(name: str, timeout: float, max_attempts: int, hedge_after: float = None,
+            retry_timeouts: bool = True) -> ResiliencePolicy:
+    return ResiliencePolicy(
+        name=name,
+        timeout=timeout,
+        max_attempts=max_attempts,
+        backoff_base=settings.RETRY_BACKOFF_BASE_SECONDS,
+        backoff_max=settings.RETRY_BACKOFF_MAX_SECONDS,
+        hedge_after=hedge_after,
+        max_workers=settings.RESILIENCE_WORKERS_PER_DEPENDENCY,
+        retry_timeouts=retry_timeouts,
+        breaker=CircuitBreaker(
+            name,
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.CIRCUIT_RESET_SECONDS
+        )
+    )
+
+# Per-dependency policies. Query embedding and Pinecone query are cheap and idempotent, so they may hedge.
+# Each call site has its own breaker: a stalled upsert path should not fail-fast the chat path.
+policies = {
+    "embed_query": _policy("embed_query", settings.EMBEDDING_TIMEOUT_SECONDS, settings.EMBEDDING_MAX_ATTEMPTS,
+                           hedge_after=settings.EMBEDDING_HEDGE_AFTER_SECONDS),
+    "embed_documents": _policy("embed_documents", settings.EMBEDDING_BATCH_TIMEOUT_SECONDS, settings.EMBEDDING_MAX_ATTEMPTS),
+    "pinecone_query": _policy("pinecone_query", settings.PINECONE_TIMEOUT_SECONDS, settings.PINECONE_MAX_ATTEMPTS,
+                              hedge_after=settings.PINECONE_HEDGE_AFTER_SECONDS),
+    "pinecone_upsert": _policy("pinecone_upsert", settings.PINECONE_UPSERT_TIMEOUT_SECONDS, settings.PINECONE_MAX_ATTEMPTS),
+}
+
+_policies_lock = threading.Lock()
+
+def bedrock_policy(model_id: str) -> ResiliencePolicy:
+    """Policy for one Bedrock model; each model gets its own breaker so routing can avoid a failing one."""
+    name = f"bedrock:{model_id}"
+    with _policies_lock:
+        if name not in policies:
+            # Generations are not idempotent: throttling and 5xx are retried, timeouts are not
+            policies[name] = _policy(name, settings.BEDROCK_TIMEOUT_SECONDS, settings.BEDROCK_MAX_ATTEMPTS,
+                                     retry_timeouts=False)
+        return policies[name]
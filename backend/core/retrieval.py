@@ -0,0 +1,265 @@
+import contextvars
+import hashlib
+import re
+import unicodedata
+import numpy as np
+from core.profiling import record_size
+
+DEFAULT_COLLECTION = "general"
+# Pinecone namespace holding one summary vector per source file; never a collection
+SUMMARY_NAMESPACE = "__summaries__"
+
+def collection_name(name: str) -> str:
+    """Slug used as the Pinecone namespace for a top-level folder ("Huella Carbono" -> "huella-carbono")."""
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-")
+    return slug or DEFAULT_COLLECTION
+
+def namespaces_for(collections: list[str]) -> list[str]:
+    """Map requested collection names to namespaces; "default" is the pre-collections namespace."""
+    if not collections:
+        return None
+    return sorted({"" if name == "default" else collection_name(name) for name in collections})
+
+def searchable_namespaces(namespaces: list[str]) -> list[str]:
+    """Namespaces an unfiltered query searches: the pre-collections "" namespace only while no collection exists.
+
+    Re-ingesting an index created before collections writes every chunk again
+    into a collection namespace, so searching "" as well would return each of
+    them twice. It stays reachable by asking for the "default" collection.
+    """
+    return [namespace for namespace in namespaces if namespace] or [""]
+
+def normalize_file_types(file_types: list[str]) -> list[str]:
+    """Match the ingest metadata format: lowercase with a leading dot ("PDF" -> ".pdf")."""
+    return [f".{file_type.lower().lstrip('.')}" for file_type in file_types if file_type.strip()]
+
+def metadata_filter(file_types: list[str] = None, sources: list[str] = None) -> dict:
+    """Pinecone metadata filter restricting chunks to file types and/or source files (None if unrestricted)."""
+    conditions = {}
+    if file_types:
+        conditions["file_type"] = {"$in": file_types}
+    if sources:
+        conditions["source"] = {"$in": sources}
+    return conditions or None
+
+def normalize_query(text: str) -> str:
+    """Cache-key form of a question: NFC, collapsed whitespace, no surrounding ¿?¡! or trailing period.
+
+    Lets a draft prefetched while typing ("qué es la huella de carbono")
+    match the question finally sent ("¿qué es la huella de carbono?").
+    """
+    text = " ".join(unicodedata.normalize("NFC", text).split())
+    return text.strip("¿?¡!. ")
+
+def mmr_select(query_embedding, candidate_embeddings, scores, k: int, lambda_mult: float = 0.5,
+               score_threshold: float = 0.0, min_k: int = 1, redundancy_threshold: float = 0.97) -> list[int]:
+    """Pick up to k diverse, relevant candidates with maximal marginal relevance.
+
+    Candidates scoring below ``score_threshold`` are dropped before selection
+    (keeping at least ``min_k`` of the best ones), and candidates nearly
+    identical to an already selected one (cosine >= ``redundancy_threshold``)
+    are never picked, so the number of results adapts to how much distinct,
+    relevant context the query actually has. Returns indices into the
+    candidate list, in selection order.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    if scores.size == 0 or k <= 0:
+        return []
+
+    order = np.argsort(-scores)
+    eligible = order[scores[order] >= score_threshold]
+    if eligible.size < min_k:
+        eligible = order[:min_k]
+    if eligible.size == 0:
+        return []
+
+    vectors = np.asarray(candidate_embeddings, dtype=np.float32)[eligible]
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = vectors @ query
+    # Pairwise candidate similarity, computed once for the whole selection
+    similarity = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(len(eligible), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, len(eligible)):
+        available &= max_similarity < redundancy_threshold
+        if not available.any():
+            break
+        mmr = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return [int(eligible[i]) for i in selected]
+
+def rerank_matches(query_embedding, matches: list, k: int, lambda_mult: float = 0.5, score_threshold: float = 0.0,
+                   min_k: int = 1) -> list[dict]:
+    """Turn over-fetched matches (with values) into at most k diverse documents, as returned by retrieval."""
+    # Identical chunks (e.g. the same file ingested under two paths) add nothing
+    candidates = []
+    seen_texts = set()
+    for match in matches:
+        text = match['metadata'].get('text', '')
+        if text in seen_texts:
+            continue
+        seen_texts.add(text)
+        candidates.append(match)
+
+    if not candidates:
+        return []
+
+    selected = mmr_select(
+        query_embedding,
+        [match['values'] for match in candidates],
+        [match['score'] for match in candidates],
+        k=k,
+        lambda_mult=lambda_mult,
+        score_threshold=score_threshold,
+        min_k=min_k
+    )
+
+    return [
+        {
+            "page_content": candidates[i]['metadata'].get('text', ''),
+            "metadata": {
+                "source": candidates[i]['metadata'].get('source', 'Unknown'),
+                "score": candidates[i]['score']
+            }
+        }
+        for i in selected
+    ]
+
+# The retrieval path below runs against any index with Pinecone's ``query(**kwargs)`` and a
+# ``list_namespaces()`` that leaves out SUMMARY_NAMESPACE: the guarded Pinecone index in
+# core.vector_store, or core.local_index.LocalVectorIndex for offline evaluation.
+
+def search_matches(index, vector, top_k: int, namespaces: list[str] = None, file_types: list[str] = None,
+                   include_values: bool = False, sources: list[str] = None, executor=None) -> list:
+    """Query the given namespaces (all of them by default) and merge the top_k matches; in parallel with an executor."""
+    if namespaces is None:
+        namespaces = searchable_namespaces(index.list_namespaces())
+    chunk_filter = metadata_filter(file_types, sources)
+
+    def query_namespace(namespace: str):
+        results = index.query(
+            vector=vector,
+            top_k=top_k,
+            namespace=namespace,
+            filter=chunk_filter,
+            include_metadata=True,
+            include_values=include_values
+        )
+        return list(results['matches'])
+
+    if len(namespaces) == 1 or executor is None:
+        matches = [match for namespace in namespaces for match in query_namespace(namespace)]
+    else:
+        # Each query runs in a copy of the caller's context so profiling stages are attributed to the request
+        futures = [executor.submit(contextvars.copy_context().run, query_namespace, namespace) for namespace in namespaces]
+        matches = [match for future in futures for match in future.result()]
+
+    matches.sort(key=lambda match: match['score'], reverse=True)
+    return matches[:top_k]
+
+def select_documents(index, vector, top_docs: int, namespaces: list[str] = None, file_types: list[str] = None) -> list[dict]:
+    """First retrieval stage: metadata of the source files whose summary vector is closest to the query."""
+    summary_filter = metadata_filter(file_types) or {}
+    if namespaces is not None:
+        summary_filter["namespace"] = {"$in": namespaces}
+    results = index.query(
+        vector=vector,
+        top_k=top_docs,
+        namespace=SUMMARY_NAMESPACE,
+        filter=summary_filter or None,
+        include_metadata=True
+    )
+    return [match['metadata'] for match in results['matches']]
+
+def candidate_matches(index, vector, top_k: int, namespaces: list[str] = None, file_types: list[str] = None,
+                      include_values: bool = False, top_docs: int = None, executor=None) -> list:
+    """Chunk matches for a query; with top_docs, only from the chunks of the top documents.
+
+    Falls back to a flat search when no summaries match (e.g. an index
+    ingested before summaries existed).
+    """
+    if top_docs:
+        documents = select_documents(index, vector, top_docs, namespaces, file_types)
+        record_size("hierarchical_documents", len(documents))
+        if documents:
+            return search_matches(
+                index, vector, top_k,
+                namespaces=sorted({document['namespace'] for document in documents}),
+                file_types=file_types,
+                include_values=include_values,
+                sources=[document['source'] for document in documents],
+                executor=executor
+            )
+    return search_matches(index, vector, top_k, namespaces=namespaces, file_types=file_types,
+                          include_values=include_values, executor=executor)
+
+class DocumentSummaries:
+    """Accumulates one centroid vector per source file from its chunk embeddings.
+
+    Chunks arrive batch by batch during ingestion; each is normalized before
+    summing, so the centroid weighs chunks equally whatever their length.
+    ``vectors()`` returns Pinecone upsert rows for SUMMARY_NAMESPACE, with the
+    namespace the file's chunks live in, so retrieval can restrict the chunk
+    search to the selected documents.
+    """
+
+    def __init__(self):
+        self._sums = {}
+        self._counts = {}
+        self._metadata = {}
+
+    def add(self, metadatas: list[dict], embeddings: list, namespace: str):
+        for metadata, embedding in zip(metadatas, embeddings):
+            source = metadata["source"]
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+            if source in self._sums:
+                self._sums[source] += vector
+                self._counts[source] += 1
+            else:
+                self._sums[source] = vector
+                self._counts[source] = 1
+                self._metadata[source] = {
+                    "source": source,
+                    "file_type": metadata.get("file_type", ""),
+                    "collection": metadata.get("collection", DEFAULT_COLLECTION),
+                    "namespace": namespace
+                }
+
+    def __len__(self) -> int:
+        return len(self._sums)
+
+    def ids(self) -> set[str]:
+        return {summary_id(source) for source in self._sums}
+
+    def vectors(self, sources: list[str] = None) -> list[dict]:
+        """Summary rows (id, values, metadata) of the given sources, or of every source."""
+        rows = []
+        for source in self._sums if sources is None else sources:
+            if source not in self._sums:
+                continue
+            total = self._sums[source]
+            centroid = total / max(float(np.linalg.norm(total)), 1e-12)
+            rows.append({
+                "id": summary_id(source),
+                "values": centroid.tolist(),
+                "metadata": {**self._metadata[source], "chunks": self._counts[source]}
+            })
+        return rows
+
+def summary_id(source: str) -> str:
+    """Stable id of a file's summary vector, so re-ingesting overwrites it."""
+    return hashlib.sha1(f"summary|{source}".encode("utf-8")).hexdigest()
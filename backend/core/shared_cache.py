@@ -0,0 +1,305 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from array import array
+from typing import Any, Callable, Optional
+from core.config import settings
+from core.eviction import eviction_victims
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS leases (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS worker_stats (
+    pid INTEGER NOT NULL,
+    namespace TEXT NOT NULL,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL,
+    computes INTEGER NOT NULL,
+    waits INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (pid, namespace)
+);
+"""
+
+class SharedCache:
+    """Host-local cache shared by every uvicorn worker, backed by SQLite in WAL mode.
+
+    ``get_or_compute`` takes a short lease per key so that when several workers
+    miss on the same key at once only one of them calls upstream; the others
+    wait for its result. Entries expire after their TTL and the table is kept
+    under ``max_bytes`` by evicting the entries closest to expiry.
+    """
+
+    def __init__(self, path: str, max_bytes: int, enabled: bool = True, lease_seconds: float = 30.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self._writes_since_evict = 0
+        self._stats_flushed_at = 0.0
+
+        if self.enabled:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._conn().executescript(_SCHEMA)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Shared cache disabled, cannot open {path}: {e}")
+                self.enabled = False
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return a live value or None (counted as a hit or miss for this worker)."""
+        value = self._read(namespace, key)
+        self._count(namespace, "hits" if value is not None else "misses")
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float, codec: str = "json"):
+        if not self.enabled:
+            return
+        blob = _encode(value, codec)
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, codec, size, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, blob, codec, len(blob), time.time() + ttl)
+                )
+            with self._stats_lock:
+                self._writes_since_evict += 1
+                due = self._writes_since_evict >= 100
+            if due:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache write failed ({namespace}): {e}")
+
+    def get_or_compute(self, namespace: str, key: str, compute: Callable[[], Any], ttl: float, codec: str = "json") -> Any:
+        """Return the cached value, or compute it once across all workers and cache it."""
+        if not self.enabled:
+            return compute()
+
+        value = self._read(namespace, key)
+        if value is not None:
+            self._count(namespace, "hits")
+            return value
+        self._count(namespace, "misses")
+
+        deadline = time.monotonic() + self.lease_seconds
+        delay = 0.01
+        while True:
+            if self._acquire_lease(namespace, key):
+                try:
+                    # Another worker may have finished between our miss and the lease
+                    value = self._read(namespace, key)
+                    if value is None:
+                        self._count(namespace, "computes")
+                        value = compute()
+                        if value is not None:
+                            self.set(namespace, key, value, ttl, codec)
+                    return value
+                finally:
+                    self._release_lease(namespace, key)
+
+            # Someone else is computing it: wait for their result
+            self._count(namespace, "waits")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            value = self._read(namespace, key)
+            if value is not None:
+                return value
+            if time.monotonic() > deadline:
+                self._count(namespace, "computes")
+                return compute()
+
+    def increment(self, namespace: str, key: str, ttl: float) -> Optional[int]:
+        """Add one to a counter shared by every worker and return its previous value (None if unavailable)."""
+        if not self.enabled:
+            return None
+        try:
+            conn = self._conn()
+            with conn:
+                # Take the write lock before reading so concurrent increments never see the same value
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT value, codec FROM entries WHERE namespace = ? AND key = ? AND expires_at >= ?",
+                    (namespace, key, time.time())
+                ).fetchone()
+                previous = _decode(row[0], row[1]) if row else 0
+                blob = _encode(previous + 1, "json")
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, codec, size, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, blob, "json", len(blob), time.time() + ttl)
+                )
+            return previous
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache increment failed ({namespace}): {e}")
+            return None
+
+    def clear(self, namespace: str):
+        """Drop every entry in a namespace (e.g. retrieval results after re-ingestion)."""
+        if not self.enabled:
+            return
+        try:
+            with self._conn() as conn:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache clear failed ({namespace}): {e}")
+
+    def evict(self):
+        """Delete expired entries, then the soonest-to-expire ones until under the size cap."""
+        with self._stats_lock:
+            self._writes_since_evict = 0
+        try:
+            with self._conn() as conn:
+                now = time.time()
+                conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+                conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total <= self.max_bytes:
+                    return
+                rows = conn.execute("SELECT size, rowid FROM entries ORDER BY expires_at").fetchall()
+                victims = eviction_victims(rows, total, self.max_bytes)
+                conn.executemany("DELETE FROM entries WHERE rowid = ?", [(rowid,) for rowid in victims])
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache eviction failed: {e}")
+
+    def stats(self) -> dict:
+        """Hit rates for this worker plus the last flushed counters of every worker on the host."""
+        self._flush_stats(force=True)
+        with self._stats_lock:
+            local = {namespace: _with_hit_rate(counts) for namespace, counts in self._stats.items()}
+
+        workers = {}
+        if self.enabled:
+            try:
+                rows = self._conn().execute(
+                    "SELECT pid, namespace, hits, misses, computes, waits FROM worker_stats"
+                ).fetchall()
+                for pid, namespace, hits, misses, computes, waits in rows:
+                    workers.setdefault(str(pid), {})[namespace] = _with_hit_rate(
+                        {"hits": hits, "misses": misses, "computes": computes, "waits": waits}
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Shared cache stats failed: {e}")
+
+        return {"enabled": self.enabled, "path": self.path, "pid": os.getpid(), "worker": local, "workers": workers}
+
+    def _read(self, namespace: str, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        try:
+            row = self._conn().execute(
+                "SELECT value, codec FROM entries WHERE namespace = ? AND key = ? AND expires_at >= ?",
+                (namespace, key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache read failed ({namespace}): {e}")
+            return None
+        return _decode(row[0], row[1]) if row else None
+
+    def _acquire_lease(self, namespace: str, key: str) -> bool:
+        now = time.time()
+        try:
+            with self._conn() as conn:
+                cursor = conn.execute(
+                    """INSERT INTO leases (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)
+                       ON CONFLICT (namespace, key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                       WHERE leases.expires_at < ?""",
+                    (namespace, key, self.owner, now + self.lease_seconds, now)
+                )
+                return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache lease failed ({namespace}): {e}")
+            # Without a working lease table, fall back to computing locally
+            return True
+
+    def _release_lease(self, namespace: str, key: str):
+        try:
+            with self._conn() as conn:
+                conn.execute("DELETE FROM leases WHERE namespace = ? AND key = ? AND owner = ?", (namespace, key, self.owner))
+        except sqlite3.Error:
+            pass
+
+    def _count(self, namespace: str, field: str):
+        with self._stats_lock:
+            counts = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "computes": 0, "waits": 0})
+            counts[field] += 1
+        self._flush_stats()
+
+    def _flush_stats(self, force: bool = False):
+        now = time.time()
+        if not self.enabled or (not force and now - self._stats_flushed_at < 5.0):
+            return
+        self._stats_flushed_at = now
+        with self._stats_lock:
+            rows = [
+                (os.getpid(), namespace, c["hits"], c["misses"], c["computes"], c["waits"], now)
+                for namespace, c in self._stats.items()
+            ]
+        try:
+            with self._conn() as conn:
+                conn.executemany("INSERT OR REPLACE INTO worker_stats VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache stats flush failed: {e}")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers in every worker proceed while one writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+def cache_key(*parts) -> str:
+    """Stable key from arbitrary JSON-serializable parts."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _encode(value: Any, codec: str) -> bytes:
+    if codec == "float32":
+        # Embeddings: 4 bytes per dimension instead of ~20 in JSON
+        return array("f", value).tobytes()
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+def _decode(blob: bytes, codec: str) -> Any:
+    if codec == "float32":
+        values = array("f")
+        values.frombytes(blob)
+        return values.tolist()
+    return json.loads(blob.decode("utf-8"))
+
+def _with_hit_rate(counts: dict) -> dict:
+    lookups = counts["hits"] + counts["misses"]
+    return {**counts, "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0}
+
+# Global instance
+shared_cache = SharedCache(
+    path=settings.SHARED_CACHE_PATH,
+    max_bytes=settings.SHARED_CACHE_MAX_BYTES,
+    enabled=settings.SHARED_CACHE_ENABLED
+)
@@ -0,0 +1,200 @@
+"""Export and import Pinecone index snapshots without re-embedding.
+
+A snapshot is a directory with:
+
+- ``embeddings.npy``: float32 matrix, one row per vector
+- ``metadata.jsonl``: one ``{"id", "namespace", "metadata"}`` line per row, in the same order
+- ``manifest.json``: index name, dimension, metric, embedding model and per-namespace counts
+
+Usage (from the backend directory)::
+
+    python -m core.snapshot export snapshots/2025-01-01
+    python -m core.snapshot import snapshots/2025-01-01 --index other-index --create
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from pinecone import Pinecone, ServerlessSpec
+from core.config import settings
+from core.embedding_profiles import embedding_profile
+from core.resilience import policies
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+def export_snapshot(index, directory: str, namespaces: list[str] = None, workers: int = 8,
+                    index_name: str = None) -> dict:
+    """Page through every namespace of ``index`` and write a snapshot to ``directory``."""
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    stats = index.describe_index_stats()
+    dimension = stats.dimension
+    if namespaces is None:
+        namespaces = sorted(stats.namespaces.keys())
+
+    raw_path = os.path.join(directory, EMBEDDINGS_FILE + ".raw")
+    counts = {}
+    total = 0
+    with open(raw_path, "wb") as raw, open(os.path.join(directory, METADATA_FILE), "w", encoding="utf-8") as meta, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+
+        def write_page(namespace: str, vectors: dict) -> int:
+            ids = sorted(vectors.keys())
+            if not ids:
+                return 0
+            raw.write(np.asarray([vectors[vector_id].values for vector_id in ids], dtype=np.float32).tobytes())
+            for vector_id in ids:
+                meta.write(json.dumps({
+                    "id": vector_id,
+                    "namespace": namespace,
+                    "metadata": dict(vectors[vector_id].metadata or {})
+                }, ensure_ascii=False) + "\n")
+            return len(ids)
+
+        for namespace in namespaces:
+            # index.list yields pages of ids; fetch pages concurrently and write them in listing order,
+            # with a bounded window of in-flight fetches so memory stays flat on large namespaces
+            pending = deque()
+            count = 0
+            for page in index.list(namespace=namespace):
+                pending.append(pool.submit(policies["pinecone_query"].call, index.fetch, ids=list(page), namespace=namespace))
+                if len(pending) >= workers * 4:
+                    count += write_page(namespace, pending.popleft().result().vectors)
+            while pending:
+                count += write_page(namespace, pending.popleft().result().vectors)
+            counts[namespace] = count
+            total += count
+            logger.info(f"Exported {count} vectors from namespace '{namespace}'")
+
+    _raw_to_npy(raw_path, os.path.join(directory, EMBEDDINGS_FILE), total, dimension)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "index": index_name or settings.PINECONE_INDEX_NAME,
+        "dimension": dimension,
+        "metric": "cosine",
+        "embedding_model": embedding_profile.model_id,
+        "embedding_profile": embedding_profile.name,
+        "created_at": time.time(),
+        "count": total,
+        "namespaces": counts
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    return _throughput(manifest, directory, time.perf_counter() - started)
+
+def import_snapshot(index, directory: str, batch_size: int = 100, workers: int = 8) -> dict:
+    """Bulk-upsert a snapshot into ``index`` with parallel batches (same ids, so re-running is idempotent)."""
+    started = time.perf_counter()
+    manifest = load_manifest(directory)
+    embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+    if embeddings.shape != (manifest["count"], manifest["dimension"]):
+        raise ValueError(f"Snapshot is inconsistent: embeddings {embeddings.shape}, manifest {manifest['count']}x{manifest['dimension']}")
+
+    target_dimension = index.describe_index_stats().dimension
+    if target_dimension and target_dimension != manifest["dimension"]:
+        raise ValueError(f"Target index dimension {target_dimension} != snapshot dimension {manifest['dimension']}")
+
+    def upsert(namespace: str, rows: list[dict], start: int):
+        values = embeddings[start:start + len(rows)].tolist()
+        vectors = [
+            {"id": row["id"], "values": vector, "metadata": row["metadata"]}
+            for row, vector in zip(rows, values)
+        ]
+        policies["pinecone_upsert"].call(index.upsert, vectors=vectors, namespace=namespace)
+        return len(vectors)
+
+    upserted = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool, \
+            open(os.path.join(directory, METADATA_FILE), "r", encoding="utf-8") as meta:
+        futures = []
+        batch, batch_start, position = [], 0, 0
+        for line in meta:
+            row = json.loads(line)
+            # Batches never span namespaces
+            if batch and (len(batch) == batch_size or row["namespace"] != batch[0]["namespace"]):
+                futures.append(pool.submit(upsert, batch[0]["namespace"], batch, batch_start))
+                batch, batch_start = [], position
+            batch.append(row)
+            position += 1
+            # Bound the number of in-flight batches so memory stays flat on large snapshots
+            if len(futures) >= workers * 4:
+                upserted += sum(future.result() for future in futures)
+                futures = []
+        if batch:
+            futures.append(pool.submit(upsert, batch[0]["namespace"], batch, batch_start))
+        upserted += sum(future.result() for future in futures)
+
+    if upserted != manifest["count"]:
+        raise ValueError(f"Imported {upserted} vectors but the manifest lists {manifest['count']}")
+    return _throughput(manifest, directory, time.perf_counter() - started)
+
+def load_manifest(directory: str) -> dict:
+    with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    return manifest
+
+def _raw_to_npy(raw_path: str, npy_path: str, rows: int, dimension: int):
+    """Prefix the raw float32 rows with an .npy header (row count is only known once export ends)."""
+    with open(npy_path, "wb") as out, open(raw_path, "rb") as raw:
+        np.lib.format.write_array_header_1_0(out, {"descr": "<f4", "fortran_order": False, "shape": (rows, dimension)})
+        shutil.copyfileobj(raw, out, length=16 * 1024 * 1024)
+    os.remove(raw_path)
+
+def _throughput(manifest: dict, directory: str, seconds: float) -> dict:
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in (EMBEDDINGS_FILE, METADATA_FILE))
+    return {
+        "vectors": manifest["count"],
+        "namespaces": manifest["namespaces"],
+        "bytes": size,
+        "seconds": round(seconds, 2),
+        "vectors_per_second": round(manifest["count"] / seconds, 1) if seconds else 0.0,
+        "mb_per_second": round(size / 1e6 / seconds, 2) if seconds else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/import Pinecone index snapshots without re-embedding.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory")
+    parser.add_argument("--index", default=settings.PINECONE_INDEX_NAME, help="Index to read from / write to")
+    parser.add_argument("--api-key", default=settings.PINECONE_API_KEY, help="Pinecone API key (use another project's key to migrate)")
+    parser.add_argument("--namespace", action="append", help="Export only these namespaces (repeatable)")
+    parser.add_argument("--workers", type=int, default=settings.SNAPSHOT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=settings.SNAPSHOT_BATCH_SIZE)
+    parser.add_argument("--create", action="store_true", help="On import, create the index if it does not exist")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    pc = Pinecone(api_key=args.api_key)
+
+    if args.command == "export":
+        result = export_snapshot(pc.Index(args.index), args.directory, namespaces=args.namespace,
+                                 workers=args.workers, index_name=args.index)
+    else:
+        if args.create and args.index not in pc.list_indexes().names():
+            manifest = load_manifest(args.directory)
+            pc.create_index(
+                name=args.index,
+                dimension=manifest["dimension"],
+                metric=manifest["metric"],
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+            )
+        result = import_snapshot(pc.Index(args.index), args.directory, batch_size=args.batch_size, workers=args.workers)
+
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
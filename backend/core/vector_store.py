@@ -1,58 +1,131 @@
 from pinecone import Pinecone, ServerlessSpec
-from langchain_aws import BedrockEmbeddings
 from core.config import settings
+from core.embedding_profiles import embedding_profile, bedrock_embeddings
+from core.profiling import stage
+from core.resilience import policies
+from core.retrieval import SUMMARY_NAMESPACE, candidate_matches, normalize_query, rerank_matches
+from core.shared_cache import shared_cache, cache_key
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import threading
+import time
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# Fans one query out over several namespaces
+_namespace_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pinecone-ns")
+
+class GuardedIndex:
+    """Pinecone index as core.retrieval uses it: queries under the pinecone_query policy, a cached namespace list."""
+
+    def __init__(self, index):
+        self.index = index
+        # (expires_at, namespaces), used when the shared cache is disabled
+        self._namespaces = None
+        self._lock = threading.Lock()
+
+    def query(self, **kwargs):
+        with stage("pinecone_query"):
+            return policies["pinecone_query"].call(self.index.query, **kwargs)
+
+    def list_namespaces(self) -> list[str]:
+        """Collections (Pinecone namespaces) currently in the index; "" is the default namespace."""
+        if shared_cache.enabled:
+            return shared_cache.get_or_compute(
+                "index",
+                cache_key("namespaces", settings.PINECONE_INDEX_NAME),
+                self._describe_namespaces,
+                ttl=settings.NAMESPACE_CACHE_TTL_SECONDS
+            )
+        # Without the shared cache, keep the list per process so queries don't each call describe_index_stats
+        with self._lock:
+            if self._namespaces and self._namespaces[0] > time.time():
+                return self._namespaces[1]
+        namespaces = self._describe_namespaces()
+        with self._lock:
+            self._namespaces = (time.time() + settings.NAMESPACE_CACHE_TTL_SECONDS, namespaces)
+        return namespaces
+
+    def forget_namespaces(self):
+        """Drop the cached namespace list, e.g. after ingestion added collections."""
+        with self._lock:
+            self._namespaces = None
+        shared_cache.clear("index")
+
+    def _describe_namespaces(self) -> list[str]:
+        return sorted(name for name in self.index.describe_index_stats().namespaces.keys() if name != SUMMARY_NAMESPACE)
+
 class VectorStore:
     def __init__(self):
         try:
             # Initialize Pinecone
             self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
 
-            # Initialize Bedrock embeddings
-            self.embeddings = BedrockEmbeddings(
-                model_id="amazon.titan-embed-text-v1",
-                region_name=settings.AWS_REGION,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-            )
+            # Initialize Bedrock embeddings for the configured profile
+            self.profile = embedding_profile
+            self.embeddings = bedrock_embeddings(self.profile)
 
             # Check if index exists, create if not
             if settings.PINECONE_INDEX_NAME not in self.pc.list_indexes().names():
                 logger.info(f"Creating Pinecone index: {settings.PINECONE_INDEX_NAME}")
                 self.pc.create_index(
                     name=settings.PINECONE_INDEX_NAME,
-                    dimension=1536,  # Titan embeddings dimension
+                    dimension=self.profile.dimension,
                     metric="cosine",
                     spec=ServerlessSpec(cloud="aws", region="us-east-1")
                 )
 
             # Get index
             self.index = self.pc.Index(settings.PINECONE_INDEX_NAME)
+            self.search_index = GuardedIndex(self.index)
+            index_dimension = self.pc.describe_index(settings.PINECONE_INDEX_NAME).dimension
+            if index_dimension != self.profile.dimension:
+                raise ValueError(
+                    f"Index {settings.PINECONE_INDEX_NAME} has dimension {index_dimension} but embedding profile "
+                    f"{self.profile.name} produces {self.profile.dimension}; use another PINECONE_INDEX_NAME"
+                )
             logger.info("Vector store initialized successfully")
 
         except Exception as e:
             logger.error(f"Failed to initialize vector store: {e}")
             raise
 
-    def similarity_search(self, query: str, k: int = 4):
-        """Search for similar documents."""
+    def embed_query(self, query: str) -> list[float]:
+        """Embed a query, shared across workers through the cache and guarded by the embed_query policy."""
+        with stage("embed_query"):
+            return shared_cache.get_or_compute(
+                "embeddings",
+                cache_key(self.profile.name, query),
+                lambda: self.profile.transform(policies["embed_query"].call(self.embeddings.embed_query, query)),
+                ttl=settings.EMBEDDING_CACHE_TTL_SECONDS,
+                # Full precision: a cached query must return exactly what a fresh embedding would
+                codec="float32"
+            )
+
+    def candidate_matches(self, vector: list[float], top_k: int, namespaces: list[str] = None,
+                          file_types: list[str] = None, include_values: bool = False) -> list:
+        """Chunk matches for a query, from the top documents only when HIERARCHICAL_RETRIEVAL is on."""
+        return candidate_matches(
+            self.search_index, vector, top_k,
+            namespaces=namespaces,
+            file_types=file_types,
+            include_values=include_values,
+            top_docs=settings.HIERARCHICAL_TOP_DOCS if settings.HIERARCHICAL_RETRIEVAL else None,
+            executor=_namespace_pool
+        )
+
+    def similarity_search(self, query: str, k: int = 4, namespaces: list[str] = None, file_types: list[str] = None):
+        """Search for similar documents, optionally restricted to collections and file types."""
         try:
             # Generate embedding for query
-            query_embedding = self.embeddings.embed_query(query)
+            query_embedding = self.embed_query(query)
 
             # Search in Pinecone
-            results = self.index.query(
-                vector=query_embedding,
-                top_k=k,
-                include_metadata=True
-            )
+            matches = self.candidate_matches(query_embedding, k, namespaces=namespaces, file_types=file_types)
 
             docs = []
-            for match in results['matches']:
+            for match in matches:
                 docs.append({
                     "page_content": match['metadata'].get('text', ''),
                     "metadata": {
@@ -68,19 +141,60 @@ class VectorStore:
             logger.error(f"Error in similarity search: {e}")
             return []
 
-    def add_texts(self, texts: list[str], metadatas: list[dict] = None):
-        """Add texts to the vector store."""
+    def max_marginal_relevance_search(self, query: str, k: int = None, fetch_k: int = None,
+                                      lambda_mult: float = None, score_threshold: float = None,
+                                      namespaces: list[str] = None, file_types: list[str] = None):
+        """Over-fetch candidates and keep a diverse, relevant subset of at most k documents."""
+        k = k or settings.RETRIEVAL_K
+        fetch_k = max(fetch_k or settings.RETRIEVAL_FETCH_K, k)
+        lambda_mult = settings.RETRIEVAL_MMR_LAMBDA if lambda_mult is None else lambda_mult
+        score_threshold = settings.RETRIEVAL_SCORE_THRESHOLD if score_threshold is None else score_threshold
+        try:
+            # Results are shared across workers for a short TTL and dropped after each ingestion. Keyed by
+            # the normalized query so a draft prefetched while typing serves the question finally sent, and
+            # by everything else that changes the results so workers configured differently never share them
+            return shared_cache.get_or_compute(
+                "retrieval",
+                cache_key(self.profile.name, settings.PINECONE_INDEX_NAME, settings.HIERARCHICAL_RETRIEVAL,
+                          settings.HIERARCHICAL_TOP_DOCS, normalize_query(query), k, fetch_k, lambda_mult,
+                          score_threshold, namespaces, file_types),
+                lambda: self._mmr_search(query, k, fetch_k, lambda_mult, score_threshold, namespaces, file_types),
+                ttl=settings.RETRIEVAL_CACHE_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Error in MMR search: {e}")
+            return []
+
+    def _mmr_search(self, query: str, k: int, fetch_k: int, lambda_mult: float, score_threshold: float,
+                    namespaces: list[str] = None, file_types: list[str] = None) -> list[dict]:
+        """Uncached MMR search; errors propagate so they are never cached."""
+        query_embedding = self.embed_query(query)
+
+        matches = self.candidate_matches(query_embedding, fetch_k, namespaces=namespaces,
+                                         file_types=file_types, include_values=True)
+
+        with stage("mmr"):
+            docs = rerank_matches(query_embedding, matches, k, lambda_mult=lambda_mult,
+                                  score_threshold=score_threshold, min_k=settings.RETRIEVAL_MIN_K)
+
+        logger.info(f"MMR kept {len(docs)} of {len(matches)} candidates (k={k}, fetch_k={fetch_k})")
+        return docs
+
+    def add_texts(self, texts: list[str], metadatas: list[dict] = None, ids: list[str] = None, namespace: str = "") -> list[list[float]]:
+        """Add texts to a namespace of the vector store and return their embeddings. Stable ids make re-adding idempotent."""
         try:
             if metadatas is None:
                 metadatas = [{}] * len(texts)
+            if ids is None:
+                ids = [str(uuid.uuid4()) for _ in texts]
 
             # Generate embeddings for all texts
-            embeddings = self.embeddings.embed_documents(texts)
+            with stage("embed_documents"):
+                embeddings = self.profile.transform(policies["embed_documents"].call(self.embeddings.embed_documents, texts))
 
             # Prepare vectors for Pinecone
             vectors = []
-            for i, (text, metadata, embedding) in enumerate(zip(texts, metadatas, embeddings)):
-                vector_id = str(uuid.uuid4())
+            for vector_id, text, metadata, embedding in zip(ids, texts, metadatas, embeddings):
                 metadata_combined = {
                     "text": text,
                     "source": metadata.get("source", "Unknown"),
@@ -92,18 +206,37 @@ class VectorStore:
                     "metadata": metadata_combined
                 })
 
-            # Upsert to Pinecone in batches
-            batch_size = 100
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-                self.index.upsert(vectors=batch)
+            self.upsert_vectors(vectors, namespace)
 
             logger.info(f"Added {len(texts)} texts to vector store")
-            return f"Added {len(texts)} texts"
+            return embeddings
 
         except Exception as e:
             logger.error(f"Error adding texts: {e}")
             raise
 
+    def upsert_vectors(self, vectors: list[dict], namespace: str = ""):
+        """Upsert precomputed vectors (id, values, metadata) to Pinecone in batches."""
+        batch_size = 100
+        for i in range(0, len(vectors), batch_size):
+            batch = vectors[i:i + batch_size]
+            with stage("pinecone_upsert"):
+                policies["pinecone_upsert"].call(self.index.upsert, vectors=batch, namespace=namespace)
+
+    def list_ids(self, namespace: str = "") -> list[str]:
+        """Every vector id in a namespace."""
+        return policies["pinecone_query"].call(lambda: [vector_id for page in self.index.list(namespace=namespace) for vector_id in page])
+
+    def delete_vectors(self, ids: list[str], namespace: str = ""):
+        """Delete vectors by id, in batches."""
+        batch_size = 1000
+        for i in range(0, len(ids), batch_size):
+            policies["pinecone_upsert"].call(self.index.delete, ids=ids[i:i + batch_size], namespace=namespace)
+
+    def fetch_vectors(self, ids: list[str], namespace: str = "") -> dict:
+        """Stored values by id (ids missing from the index are absent)."""
+        response = policies["pinecone_query"].call(self.index.fetch, ids=ids, namespace=namespace)
+        return {vector_id: list(vector.values) for vector_id, vector in response.vectors.items()}
+
 # Global instance
 vector_store = VectorStore()
\ No newline at end of file
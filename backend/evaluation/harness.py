@@ -0,0 +1,194 @@
+"""Offline retrieval evaluation: recall@k, MRR, latency and prompt-token cost on a golden question set.
+
+Runs each question of ``golden_set.jsonl`` through the same retrieval code as
+/api/chat (core.retrieval: namespace fan-out, filters, the optional summary
+stage, exact-text dedup and MMR) and the same prompt builder, against a
+local index loaded from a snapshot (core.snapshot). Query embeddings are read
+from a recorded file, so runs are offline and deterministic; ``--record``
+embeds missing questions through Bedrock once and saves them.
+
+Results are JSONL, one line per question plus a summary line, with sorted
+keys and rounded numbers so they diff cleanly. With ``--baseline`` the run
+fails if recall@k or MRR dropped by more than ``--tolerance``.
+``--hierarchical`` evaluates two-stage retrieval (needs a snapshot taken
+after ingest started writing per-file summary vectors).
+
+Usage (from the backend directory)::
+
+    python -m evaluation.harness --snapshot snapshots/2025-01-01 --record --output evaluation/baseline.jsonl
+    python -m evaluation.harness --snapshot snapshots/2025-01-01 --k 5 --baseline evaluation/baseline.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from core.config import settings
+from core.embedding_profiles import bedrock_embeddings, get_profile
+from core.local_index import LocalVectorIndex
+from core.retrieval import candidate_matches, namespaces_for, normalize_file_types, rerank_matches
+from core.snapshot import load_manifest
+from services.prompts import build_context, build_prompt, estimate_tokens
+
+EVALUATION_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_SET = os.path.join(EVALUATION_DIR, "golden_set.jsonl")
+
+def load_golden_set(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def load_query_embeddings(path: str, questions: list[str], profile, record: bool) -> dict:
+    """Recorded question embeddings in the profile's vector space; with record=True, missing ones are embedded via Bedrock and saved."""
+    embeddings = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            embeddings = json.load(f)
+    missing = [question for question in questions if question not in embeddings]
+    if missing and not record:
+        raise SystemExit(f"{len(missing)} questions have no recorded embedding in {path}; rerun with --record")
+    if missing:
+        client = bedrock_embeddings(profile)
+        for question in missing:
+            embeddings[question] = profile.transform(client.embed_query(question))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(embeddings, f, ensure_ascii=False, sort_keys=True)
+    return embeddings
+
+def retrieve(index: LocalVectorIndex, query_embedding, k: int, fetch_k: int, lambda_mult: float,
+             score_threshold: float, collections: list[str] = None, file_types: list[str] = None,
+             top_docs: int = None) -> list[dict]:
+    """VectorStore.max_marginal_relevance_search on a local index (without caching); top_docs enables the summary stage."""
+    matches = candidate_matches(index, query_embedding, fetch_k, namespaces=namespaces_for(collections),
+                                file_types=normalize_file_types(file_types) if file_types else None,
+                                include_values=True, top_docs=top_docs)
+    return rerank_matches(query_embedding, matches, k, lambda_mult=lambda_mult,
+                          score_threshold=score_threshold, min_k=settings.RETRIEVAL_MIN_K)
+
+def evaluate(golden: list[dict], index: LocalVectorIndex, query_embeddings: dict, project, k: int, fetch_k: int,
+             lambda_mult: float, score_threshold: float, top_docs: int = None) -> list[dict]:
+    rows = []
+    for item in golden:
+        query_embedding = project(np.asarray([query_embeddings[item["question"]]], dtype=np.float32))[0]
+        started = time.perf_counter()
+        docs = retrieve(index, query_embedding, k, fetch_k, lambda_mult, score_threshold,
+                        collections=item.get("collections"), file_types=item.get("file_types"), top_docs=top_docs)
+        latency = time.perf_counter() - started
+
+        retrieved = [os.path.basename(doc["metadata"]["source"]) for doc in docs]
+        expected = item["expected_sources"]
+        hits = [source for source in expected if source in retrieved]
+        first_hit = next((rank for rank, source in enumerate(retrieved, 1) if source in expected), None)
+        prompt = build_prompt(item["question"], build_context(docs))
+        rows.append({
+            "type": "query",
+            "id": item["id"],
+            "expected": expected,
+            "retrieved": retrieved,
+            "recall_at_k": round(len(hits) / len(expected), 4) if expected else 0.0,
+            "reciprocal_rank": round(1.0 / first_hit, 4) if first_hit else 0.0,
+            "latency_ms": round(latency * 1000, 2),
+            "prompt_tokens": estimate_tokens(prompt)
+        })
+    return rows
+
+def summarize(rows: list[dict], config: dict) -> dict:
+    latencies = [row["latency_ms"] for row in rows]
+    return {
+        "type": "summary",
+        "queries": len(rows),
+        "recall_at_k": round(float(np.mean([row["recall_at_k"] for row in rows])), 4),
+        "mrr": round(float(np.mean([row["reciprocal_rank"] for row in rows])), 4),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+        "prompt_tokens_mean": round(float(np.mean([row["prompt_tokens"] for row in rows])), 1),
+        "config": config
+    }
+
+def compare(summary: dict, rows: list[dict], baseline_path: str, tolerance: float) -> tuple[list[str], list[str]]:
+    """Regressions against a baseline results file: (summary metrics beyond tolerance, individual questions)."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = [json.loads(line) for line in f if line.strip()]
+    baseline_summary = next(line for line in baseline if line["type"] == "summary")
+    baseline_rows = {line["id"]: line for line in baseline if line["type"] == "query"}
+
+    metrics = [
+        f"{metric}: {baseline_summary[metric]} -> {summary[metric]}"
+        for metric in ("recall_at_k", "mrr")
+        if summary[metric] < baseline_summary[metric] - tolerance
+    ]
+    questions = [
+        f"{row['id']}: recall {baseline_rows[row['id']]['recall_at_k']} -> {row['recall_at_k']} (retrieved {row['retrieved']})"
+        for row in rows
+        if row["id"] in baseline_rows and row["recall_at_k"] < baseline_rows[row["id"]]["recall_at_k"]
+    ]
+    return metrics, questions
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and cost on the golden question set.")
+    parser.add_argument("--snapshot", required=True, help="Index snapshot directory (python -m core.snapshot export)")
+    parser.add_argument("--golden", default=GOLDEN_SET)
+    parser.add_argument("--query-embeddings", help="Recorded question embeddings (default: evaluation/query_embeddings.<profile>.json)")
+    parser.add_argument("--record", action="store_true", help="Embed questions missing from the recording through Bedrock")
+    parser.add_argument("--profile", help="Evaluate a projected profile of the snapshot's model (e.g. titan-v1-proj256)")
+    parser.add_argument("--quantization", default="none", choices=["none", "int8", "binary"])
+    parser.add_argument("--k", type=int, default=settings.RETRIEVAL_K)
+    parser.add_argument("--fetch-k", type=int, default=settings.RETRIEVAL_FETCH_K)
+    parser.add_argument("--lambda-mult", type=float, default=settings.RETRIEVAL_MMR_LAMBDA)
+    parser.add_argument("--score-threshold", type=float, default=settings.RETRIEVAL_SCORE_THRESHOLD)
+    parser.add_argument("--hierarchical", action="store_true", help="Two-stage retrieval through the per-file summary vectors")
+    parser.add_argument("--top-docs", type=int, default=settings.HIERARCHICAL_TOP_DOCS)
+    parser.add_argument("--output", help="Write JSONL results here (default: stdout only)")
+    parser.add_argument("--baseline", help="Previous results to compare against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.01)
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.snapshot)
+    snapshot_profile = get_profile(manifest.get("embedding_profile", "titan-v1"))
+    profile = get_profile(args.profile) if args.profile else snapshot_profile
+    if profile.model_id != snapshot_profile.model_id:
+        raise SystemExit(f"Profile {profile.name} uses {profile.model_id}; the snapshot was embedded with {snapshot_profile.model_id}")
+    if profile.name != snapshot_profile.name and snapshot_profile.projection_dim:
+        raise SystemExit(f"Snapshot vectors are already projected ({snapshot_profile.name}); "
+                         f"evaluating {profile.name} needs a snapshot of unprojected {snapshot_profile.model_id} vectors")
+
+    golden = load_golden_set(args.golden)
+    embeddings_path = args.query_embeddings or os.path.join(EVALUATION_DIR, f"query_embeddings.{snapshot_profile.name}.json")
+    query_embeddings = load_query_embeddings(embeddings_path, [item["question"] for item in golden], snapshot_profile, args.record)
+
+    # Snapshot vectors are already in the snapshot profile's space; only a different profile needs projecting
+    project = profile.project if profile.name != snapshot_profile.name else (lambda vectors: vectors)
+    index = LocalVectorIndex.from_snapshot(args.snapshot, quantization=args.quantization, project=project)
+
+    config = {
+        "snapshot": os.path.basename(os.path.normpath(args.snapshot)),
+        "vectors": len(index.ids),
+        "profile": profile.name,
+        "quantization": args.quantization,
+        "k": args.k,
+        "fetch_k": args.fetch_k,
+        "lambda_mult": args.lambda_mult,
+        "score_threshold": args.score_threshold,
+        "top_docs": args.top_docs if args.hierarchical else None
+    }
+    rows = evaluate(golden, index, query_embeddings, project, args.k, args.fetch_k, args.lambda_mult, args.score_threshold,
+                    top_docs=args.top_docs if args.hierarchical else None)
+    summary = summarize(rows, config)
+
+    lines = [json.dumps(line, ensure_ascii=False, sort_keys=True) for line in rows + [summary]]
+    print("\n".join(lines))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    if args.baseline:
+        metric_regressions, question_regressions = compare(summary, rows, args.baseline, args.tolerance)
+        for regression in metric_regressions + question_regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        # Single questions may flip; only a drop in the aggregate beyond tolerance fails the run
+        if metric_regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
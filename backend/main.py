@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.chat import router as chat_router
+from core import profiling
 
 app = FastAPI(title="Sostenibilidad Assistant API", version="1.0.0")
 
@@ -15,6 +16,12 @@ app.add_middleware(
 
 app.include_router(chat_router, prefix="/api")
 
+# Requests that get per-stage timings, the slow-request log and (on demand) a sampled profile.
+# Ingestion jobs are profiled in their background thread (ingest_service._run_profiled)
+PROFILED_PATHS = {"/api/chat"}
+
+app.add_middleware(profiling.ProfilingMiddleware, paths=PROFILED_PATHS)
+
 @app.get("/")
 async def root():
     return {"message": "Sostenibilidad Assistant API"}
@@ -55,6 +62,7 @@ async def health():
             health_status["services"]["bedrock"] = {
                 "status": "configured",
                 "model": settings.BEDROCK_MODEL_ID,
+                "model_pool": [model["id"] for model in settings.BEDROCK_MODEL_POOL],
                 "region": settings.AWS_REGION,
                 "message": f"Modelo {settings.BEDROCK_MODEL_ID} configurado en {settings.AWS_REGION}"
             }
@@ -4,8 +4,19 @@ from typing import Optional
 class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
+    # Restrict retrieval to these collections (top-level document folders) and file types (".pdf", "xlsx", ...)
+    collections: Optional[list[str]] = None
+    file_types: Optional[list[str]] = None
+
+class PrefetchRequest(BaseModel):
+    # Current draft of the question; session_id groups the drafts of one input box
+    text: str
+    session_id: str
+    collections: Optional[list[str]] = None
+    file_types: Optional[list[str]] = None
 
 class ChatResponse(BaseModel):
     response: str
     conversation_id: str
-    sources: Optional[list[str]] = None
\ No newline at end of file
+    sources: Optional[list[str]] = None
+    model: Optional[str] = None
\ No newline at end of file
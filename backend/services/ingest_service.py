@@ -0,0 +1,755 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+from core.config import settings
+from core import profiling
+from core.retrieval import collection_name, DEFAULT_COLLECTION, SUMMARY_NAMESPACE, DocumentSummaries
+from core.shared_cache import shared_cache
+from utils.corpus_walker import corpus_walker
+from utils.dedup import ChunkDeduplicator
+from utils.extraction_cache import extraction_cache, ExtractionTimer
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock (Windows) ingestion is only guarded within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ['.txt', '.pdf', '.xlsx', '.xls', '.csv', '.docx', '.pptx']
+INGEST_CHUNK_SIZE = 3000
+FINISHED_STATUSES = ("completed", "cancelled", "failed")
+# Finished jobs kept in memory; older ones are still reported from their checkpoint status file
+MAX_FINISHED_JOBS = 20
+
+# Prefixes of the messages _parse_content returns instead of raising
+_EXTRACTION_FAILURE_MARKERS = (
+    "content extraction failed for:",
+    "Error extracting content from",
+)
+
+def split_text_for_ingestion(text: str, max_chunk_size: int = 3000) -> list[str]:
+    """Split text into chunks for ingestion, ensuring each chunk is under token limit."""
+    return [text[start:end] for start, end in chunk_spans(text, max_chunk_size)]
+
+def chunk_spans(text: str, max_chunk_size: int = 3000) -> list[tuple[int, int]]:
+    """Compute (start, end) offsets of the stripped chunks produced by the ingestion splitter."""
+    if len(text) <= max_chunk_size:
+        return [(0, len(text))]
+
+    spans = []
+    start = 0
+    while start < len(text):
+        end = start + max_chunk_size
+        if end < len(text):
+            # Find a good break point (sentence, paragraph, or word boundary)
+            break_point = text.rfind('\n\n', start, end)  # Paragraph break
+            if break_point == -1:
+                break_point = text.rfind('\n', start, end)  # Line break
+            if break_point == -1:
+                break_point = text.rfind('. ', start, end)  # Sentence break
+            if break_point == -1:
+                break_point = text.rfind(' ', start, end)  # Word break
+            if break_point == -1:
+                break_point = end  # Hard break
+
+            span = _strip_span(text, start, break_point)
+            start = break_point + 1
+        else:
+            span = _strip_span(text, start, len(text))
+            start = len(text)
+
+        if span:
+            spans.append(span)
+
+    return spans
+
+def _strip_span(text: str, start: int, end: int):
+    """Equivalent of text[start:end].strip(), returned as offsets (None if empty)."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+def extract_and_split(file_path: str, file_ext: str, max_chunk_size: int, timer: ExtractionTimer = None) -> tuple[str, list[str]]:
+    """Extract a file's content and split it, reusing cached text and chunk boundaries."""
+    key = extraction_cache.fingerprint(file_path, file_ext)
+    entry = extraction_cache.get(key)
+    if entry is not None:
+        if timer:
+            timer.cache_hits += 1
+        content = entry["text"]
+        spans = entry.get("chunks", {}).get(str(max_chunk_size))
+        if spans is None:
+            spans = chunk_spans(content, max_chunk_size)
+            entry.setdefault("chunks", {})[str(max_chunk_size)] = spans
+            extraction_cache.put(key, entry)
+        return content, [content[start:end] for start, end in spans]
+
+    started = time.perf_counter()
+    content = _parse_content(file_path, file_ext)
+    if timer:
+        timer.parse_seconds += time.perf_counter() - started
+        timer.files_parsed += 1
+
+    spans = chunk_spans(content, max_chunk_size) if content.strip() else []
+    if not _is_extraction_failure(content):
+        extraction_cache.put(key, {"text": content, "chunks": {str(max_chunk_size): spans}})
+    return content, [content[start:end] for start, end in spans]
+
+def _is_extraction_failure(content: str) -> bool:
+    """Extraction errors are reported as text; they must never be cached."""
+    return any(marker in content[:500] for marker in _EXTRACTION_FAILURE_MARKERS)
+
+def extract_content(file_path: str, file_ext: str) -> str:
+    """Simple content extraction for supported file types, served from the extraction cache when possible."""
+    key = extraction_cache.fingerprint(file_path, file_ext)
+    entry = extraction_cache.get(key)
+    if entry is not None:
+        return entry["text"]
+
+    content = _parse_content(file_path, file_ext)
+    if not _is_extraction_failure(content):
+        extraction_cache.put(key, {"text": content, "chunks": {}})
+    return content
+
+def _parse_content(file_path: str, file_ext: str) -> str:
+    """Parse a file with the library for its type. Parser imports stay lazy so cache hits never load them."""
+    try:
+        if file_ext == '.txt':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return f.read()
+
+        elif file_ext == '.pdf':
+            try:
+                from pypdf import PdfReader
+                reader = PdfReader(file_path)
+                content = ""
+                for page in reader.pages:
+                    content += page.extract_text() + "\n"
+                return content
+            except:
+                return f"PDF content extraction failed for: {os.path.basename(file_path)}"
+
+        elif file_ext in ['.xlsx', '.xls']:
+            try:
+                import pandas as pd
+                print(f"DEBUG: Attempting to read Excel file: {file_path}")
+
+                # Try to read all sheets
+                excel_data = pd.read_excel(file_path, sheet_name=None, engine='openpyxl')
+                print(f"DEBUG: Successfully read {len(excel_data)} sheets from Excel")
+
+                content = ""
+                for sheet_name, df in excel_data.items():
+                    print(f"DEBUG: Processing sheet '{sheet_name}' with shape {df.shape}")
+                    content += f"Sheet: {sheet_name}\n"
+
+                    # Convert DataFrame to string, handling NaN values
+                    df_str = df.fillna('').astype(str)
+                    content += df_str.to_string(index=False) + "\n\n"
+
+                print(f"DEBUG: Excel extraction completed, content length: {len(content)}")
+                return content
+
+            except Exception as e:
+                print(f"DEBUG: Excel extraction failed with error: {e}")
+                # Try alternative approach with xlrd for .xls files
+                try:
+                    if file_ext == '.xls':
+                        excel_data = pd.read_excel(file_path, sheet_name=None, engine='xlrd')
+                        content = ""
+                        for sheet_name, df in excel_data.items():
+                            content += f"Sheet: {sheet_name}\n"
+                            df_str = df.fillna('').astype(str)
+                            content += df_str.to_string(index=False) + "\n\n"
+                        return content
+                except Exception as e2:
+                    print(f"DEBUG: Alternative Excel extraction also failed: {e2}")
+
+                return f"Excel content extraction failed for: {os.path.basename(file_path)} - Error: {str(e)}"
+
+        elif file_ext == '.csv':
+            try:
+                import pandas as pd
+                df = pd.read_csv(file_path)
+                return df.to_string()
+            except:
+                return f"CSV content extraction failed for: {os.path.basename(file_path)}"
+
+        elif file_ext == '.docx':
+            try:
+                from docx import Document as DocxDocument
+                doc = DocxDocument(file_path)
+                content = ""
+                for paragraph in doc.paragraphs:
+                    content += paragraph.text + "\n"
+                return content
+            except:
+                return f"Word content extraction failed for: {os.path.basename(file_path)}"
+
+        elif file_ext in ['.pptx', '.ppt']:
+            try:
+                from unstructured.partition.auto import partition
+                elements = partition(file_path)
+                return "\n".join([str(element) for element in elements])
+            except:
+                return f"PowerPoint content extraction failed for: {os.path.basename(file_path)}"
+
+        else:
+            return ""
+
+    except Exception as e:
+        return f"Error extracting content from {file_path}: {str(e)}"
+
+class IngestJob:
+    """State and progress counters of one background ingestion run."""
+
+    def __init__(self, job_id: str, resumed: bool = False):
+        self.job_id = job_id
+        self.resumed = resumed
+        self.status = "queued"
+        self.phase = "queued"
+        self.error = None
+        self.result = None
+        self.files_total = 0
+        self.files_processed = 0
+        self.chunks_total = 0
+        self.batches_total = 0
+        self.batches_done = 0
+        self.batches_skipped = 0
+        self.vectors_upserted = 0
+        self.summaries_upserted = 0
+        self.walk = {}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.thread = None
+        self.profile_id = None
+        self.checkpoint = None
+        self.lock = None
+        self._phase_started = {}
+        self._phases_ended = None
+        self._published_at = 0.0
+
+    def set_phase(self, phase: str):
+        self.phase = phase
+        self._phase_started[phase] = time.perf_counter()
+        self.publish(force=True)
+
+    def finish(self, status: str):
+        """Record the final status; the last phase ends here."""
+        self.status = status
+        self.phase = status
+        self.finished_at = time.time()
+        self._phases_ended = time.perf_counter()
+        self.publish(force=True)
+
+    def is_cancelled(self) -> bool:
+        """Cancelled in this process, or by another worker through the checkpoint directory."""
+        if not self.cancel_event.is_set() and self.checkpoint is not None and self.checkpoint.cancel_requested():
+            self.cancel_event.set()
+        return self.cancel_event.is_set()
+
+    def publish(self, force: bool = False):
+        """Write progress where other workers can read it, at most once a second unless forced."""
+        now = time.monotonic()
+        if self.checkpoint is None or (not force and now - self._published_at < 1.0):
+            return
+        self._published_at = now
+        try:
+            self.checkpoint.write_status(self.progress())
+        except OSError as e:
+            logger.warning(f"Could not publish progress of job {self.job_id}: {e}")
+
+    def phase_durations(self) -> dict:
+        """Wall time of each phase, up to the next phase (or the end of the job, or now, for the last one)."""
+        ordered = sorted(self._phase_started.items(), key=lambda item: item[1])
+        ends = [started for _, started in ordered[1:]] + [self._phases_ended or time.perf_counter()]
+        return {phase: end - started for (phase, started), end in zip(ordered, ends)}
+
+    def _rate(self, phase: str, count: int) -> float:
+        elapsed = self.phase_durations().get(phase, 0.0)
+        return round(count / elapsed, 2) if elapsed > 0 else 0.0
+
+    def progress(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "phase": self.phase,
+            "resumed": self.resumed,
+            "files_total": self.files_total,
+            "files_processed": self.files_processed,
+            "chunks_total": self.chunks_total,
+            "batches_total": self.batches_total,
+            "batches_done": self.batches_done,
+            "batches_skipped": self.batches_skipped,
+            "vectors_upserted": self.vectors_upserted,
+            "summaries_upserted": self.summaries_upserted,
+            "walk": self.walk,
+            "files_per_second": self._rate("extracting", self.files_processed),
+            "chunks_per_second": self._rate("extracting", self.chunks_total),
+            "vectors_per_second": self._rate("upserting", self.vectors_upserted),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "profile_id": self.profile_id,
+            "result": self.result
+        }
+
+class IngestCheckpoint:
+    """Append-only JSONL log of upserted batches, used to resume an interrupted job."""
+
+    def __init__(self, checkpoint_dir: str, job_id: str):
+        self.path = os.path.join(checkpoint_dir, f"{job_id}.jsonl")
+        self.status_path = os.path.join(checkpoint_dir, f"{job_id}.status.json")
+        self.cancel_path = os.path.join(checkpoint_dir, f"{job_id}.cancel")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def read(self) -> list[dict]:
+        events = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        # A torn final line from a crash mid-write is ignored
+                        break
+        except FileNotFoundError:
+            pass
+        return events
+
+    def append(self, event: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({**event, "ts": time.time()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_status(self, progress: dict):
+        """Latest progress of the running job, with the pid of the worker running it."""
+        tmp_path = f"{self.status_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**progress, "worker_pid": os.getpid()}, f)
+        os.replace(tmp_path, self.status_path)
+
+    def read_status(self) -> Optional[dict]:
+        try:
+            with open(self.status_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def request_cancel(self):
+        with open(self.cancel_path, "w"):
+            pass
+
+    def cancel_requested(self) -> bool:
+        return os.path.exists(self.cancel_path)
+
+    def clear_cancel(self):
+        try:
+            os.remove(self.cancel_path)
+        except FileNotFoundError:
+            pass
+
+    def completed_batches(self, plan_hash: str) -> int:
+        """Number of leading batches already upserted for this exact chunk plan."""
+        done = 0
+        plan_matches = False
+        for event in self.read():
+            kind = event.get("event")
+            if kind == "plan":
+                # A different plan means the corpus changed since those batches; start over
+                plan_matches = event.get("plan_hash") == plan_hash
+                if not plan_matches:
+                    done = 0
+            elif kind == "batch" and plan_matches:
+                done = max(done, event["batch"] + 1)
+        return done
+
+class IngestLock:
+    """Host-wide ingestion lock: flock on a file in the checkpoint directory, holding the running job id.
+
+    Every uvicorn worker has its own IngestService, so the in-process check
+    alone would let two workers ingest at once. The OS releases the lock when
+    its process dies, so a crashed worker never blocks ingestion.
+    """
+
+    def __init__(self, checkpoint_dir: str):
+        self.path = os.path.join(checkpoint_dir, "ingest.lock")
+        self._file = None
+
+    def acquire(self, job_id: str) -> bool:
+        if fcntl is None:
+            logger.warning("fcntl is unavailable: ingestion is only guarded within this process, "
+                           "run a single worker while ingesting")
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, "a+", encoding="utf-8")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(job_id)
+        f.flush()
+        self._file = f
+        return True
+
+    def holder(self) -> str:
+        """Id of the job holding (or, after a crash, last holding) the lock."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def release(self):
+        if self._file is None:
+            return
+        self._file.seek(0)
+        self._file.truncate()
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+class IngestService:
+    """Runs document ingestion as cancellable, resumable background jobs.
+
+    Job state lives in the worker that runs the job and is published to the
+    checkpoint directory, so progress and cancel requests work from any
+    worker on the same host.
+    """
+
+    def __init__(self):
+        self.jobs: dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+
+    def start_job(self, resume_job_id: str = None, profile: bool = False) -> IngestJob:
+        """Start a new job, or resume a previous one from its checkpoint log (optionally under the sampling profiler)."""
+        with self._lock:
+            running = [job for job in self.jobs.values() if job.status in ("queued", "running", "cancelling")]
+            if running:
+                raise RuntimeError(f"Ingestion job {running[0].job_id} is already running")
+
+            if resume_job_id:
+                if not IngestCheckpoint(settings.INGEST_CHECKPOINT_DIR, resume_job_id).exists():
+                    raise KeyError(resume_job_id)
+                job = IngestJob(resume_job_id, resumed=True)
+            else:
+                job = IngestJob(uuid.uuid4().hex)
+
+            lock = IngestLock(settings.INGEST_CHECKPOINT_DIR)
+            try:
+                acquired = lock.acquire(job.job_id)
+            except OSError as e:
+                # Without a writable checkpoint directory the job fails on its own right away
+                logger.warning(f"Could not take the ingestion lock: {e}")
+                acquired, lock = True, None
+            if not acquired:
+                raise RuntimeError(f"Ingestion job {lock.holder() or '(unknown)'} is already running in another worker")
+            job.lock = lock
+
+            self._prune_jobs()
+            self.jobs[job.job_id] = job
+            job.thread = threading.Thread(target=self._run_profiled, args=(job, profile), name=f"ingest-{job.job_id[:8]}", daemon=True)
+            job.thread.start()
+            return job
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Progress of a job; jobs of other workers or previous processes are reported from the checkpoint directory."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.progress()
+
+        checkpoint = IngestCheckpoint(settings.INGEST_CHECKPOINT_DIR, job_id)
+        status = checkpoint.read_status()
+        if status is not None:
+            if status["status"] not in FINISHED_STATUSES and not self._running_elsewhere(job_id, status.get("worker_pid")):
+                status["status"] = "interrupted"
+            return status
+        if not checkpoint.exists():
+            return None
+        events = checkpoint.read()
+        batches = [event for event in events if event.get("event") == "batch"]
+        finished = events[-1].get("event") if events else None
+        return {
+            "job_id": job_id,
+            "status": finished if finished in FINISHED_STATUSES else "interrupted",
+            "batches_done": len(batches),
+            "vectors_upserted": sum(event.get("vectors", 0) for event in batches)
+        }
+
+    def _prune_jobs(self):
+        """Forget all but the most recent MAX_FINISHED_JOBS finished jobs (called with the lock held)."""
+        finished = sorted((job for job in self.jobs.values() if job.status in FINISHED_STATUSES),
+                          key=lambda job: job.finished_at or 0.0)
+        for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job.job_id]
+
+    def list_jobs(self) -> list[dict]:
+        return [job.progress() for job in self.jobs.values()]
+
+    def cancel_job(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            # Running in another worker: leave a cancel request it polls for
+            status = self.get_job(job_id)
+            if status is not None and status["status"] in ("queued", "running"):
+                IngestCheckpoint(settings.INGEST_CHECKPOINT_DIR, job_id).request_cancel()
+                status["status"] = "cancelling"
+            return status
+        if job.status in ("queued", "running"):
+            job.status = "cancelling"
+            job.cancel_event.set()
+        return job.progress()
+
+    def collect_files(self, stats: dict = None) -> list[tuple[str, str, str]]:
+        """Walk the document directories and return (path, extension, collection) of supported files."""
+        walker = corpus_walker(SUPPORTED_EXTENSIONS)
+        files = [
+            (file_path, file_ext, collection_for(file_path, walker.roots))
+            for file_path, file_ext, _ in walker.walk()
+        ]
+        if stats is not None:
+            stats.update(walker.stats)
+        return files
+
+    def _run_profiled(self, job: IngestJob, sample: bool):
+        """Run the job with its own stage timings (the request that started it returns immediately)."""
+        try:
+            with profiling.profile_request(f"ingest-{job.job_id[:8]}", sample=sample) as profile:
+                self._run_job(job)
+                for phase, seconds in job.phase_durations().items():
+                    profiling.add_stage(f"phase.{phase}", seconds)
+                profiling.record_size("files", job.files_total)
+                profiling.record_size("chunks", job.chunks_total)
+                profiling.record_size("vectors_upserted", job.vectors_upserted)
+            job.profile_id = profiling.finish(profile)
+        except Exception as e:
+            logger.error(f"Ingestion job {job.job_id} thread error: {e}")
+            job.error = job.error or str(e)
+        finally:
+            # A job left queued or running would block every later start_job in this process
+            if job.status not in FINISHED_STATUSES:
+                self._finish(job, job.checkpoint, "failed")
+            if job.lock is not None:
+                job.lock.release()
+
+    @staticmethod
+    def _running_elsewhere(job_id: str, pid: Optional[int]) -> bool:
+        """Whether a job with a non-final published status still has a live worker running it."""
+        if not pid or IngestLock(settings.INGEST_CHECKPOINT_DIR).holder() != job_id:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _run_job(self, job: IngestJob):
+        checkpoint = None
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            from core.vector_store import vector_store
+
+            checkpoint = IngestCheckpoint(settings.INGEST_CHECKPOINT_DIR, job.job_id)
+            # A cancel request left for an earlier run of this job id must not stop the resumed one
+            checkpoint.clear_cancel()
+            job.checkpoint = checkpoint
+            job.set_phase("scanning")
+            walk_stats = {}
+            files = self.collect_files(stats=walk_stats)
+            job.files_total = len(files)
+            job.walk = walk_stats
+
+            job.set_phase("extracting")
+            timer = ExtractionTimer()
+            deduplicator = ChunkDeduplicator(threshold=settings.DEDUP_NEAR_THRESHOLD)
+            all_texts = []
+            all_metadatas = []
+            for file_path, file_ext, collection in files:
+                if job.is_cancelled():
+                    break
+                try:
+                    content, chunks = extract_and_split(file_path, file_ext, max_chunk_size=INGEST_CHUNK_SIZE, timer=timer)
+                    if content.strip():
+                        for i, chunk in enumerate(chunks):
+                            # Skip chunks whose content (or nearly all of it) is already queued
+                            if deduplicator.check(chunk):
+                                continue
+                            all_texts.append(chunk)
+                            all_metadatas.append({
+                                "source": file_path,
+                                "file_type": file_ext,
+                                "collection": collection,
+                                "chunk": i,
+                                "total_chunks": len(chunks)
+                            })
+                        logger.info(f"Processed: {os.path.basename(file_path)} → {len(chunks)} chunks ({len(content)} chars)")
+                    else:
+                        logger.info(f"No content extracted from: {file_path}")
+                except Exception as e:
+                    logger.error(f"Error processing {file_path}: {e}")
+                job.files_processed += 1
+                job.chunks_total = len(all_texts)
+                job.publish()
+
+            if job.is_cancelled():
+                self._finish(job, checkpoint, "cancelled")
+                return
+            if not all_texts:
+                raise RuntimeError("No documents found to ingest")
+
+            # Deterministic IDs make re-upserting a batch after a crash idempotent
+            ids = [_chunk_id(meta["source"], meta["chunk"], text) for text, meta in zip(all_texts, all_metadatas)]
+            namespaces = [meta["collection"] for meta in all_metadatas]
+            plan_hash = hashlib.sha256("\n".join(f"{ns}/{vector_id}" for ns, vector_id in zip(namespaces, ids)).encode("utf-8")).hexdigest()
+            batches = _plan_batches(namespaces, settings.INGEST_BATCH_SIZE)
+            job.batches_total = len(batches)
+            resume_from = checkpoint.completed_batches(plan_hash) if job.resumed else 0
+            checkpoint.append({"event": "plan", "plan_hash": plan_hash, "batches": job.batches_total})
+
+            job.set_phase("upserting")
+            # One centroid per source file, for the first stage of hierarchical retrieval. A file's chunks are
+            # contiguous, so its summary is upserted with the batch holding its last chunk and a cancelled or
+            # failed job still leaves summaries for every file it finished
+            summaries = DocumentSummaries()
+            last_chunk = {meta["source"]: position for position, meta in enumerate(all_metadatas)}
+            files_ending_at = {position: source for source, position in last_chunk.items()}
+            for batch, (start, end) in enumerate(batches):
+                if job.is_cancelled():
+                    self._finish(job, checkpoint, "cancelled")
+                    return
+                if batch < resume_from:
+                    # Already upserted by the interrupted run; its vectors still count towards the file summaries
+                    stored = vector_store.fetch_vectors(ids[start:end], namespace=namespaces[start])
+                    found = [(meta, stored[vector_id]) for meta, vector_id in zip(all_metadatas[start:end], ids[start:end]) if vector_id in stored]
+                    summaries.add([meta for meta, _ in found], [values for _, values in found], namespace=namespaces[start])
+                    job.batches_skipped += 1
+                else:
+                    embeddings = vector_store.add_texts(all_texts[start:end], all_metadatas[start:end], ids=ids[start:end], namespace=namespaces[start])
+                    summaries.add(all_metadatas[start:end], embeddings, namespace=namespaces[start])
+                    checkpoint.append({"event": "batch", "batch": batch, "vectors": end - start})
+                    job.batches_done += 1
+                    job.vectors_upserted += end - start
+
+                finished_files = [files_ending_at[position] for position in range(start, end) if position in files_ending_at]
+                rows = summaries.vectors(finished_files)
+                if rows:
+                    vector_store.upsert_vectors(rows, namespace=SUMMARY_NAMESPACE)
+                    job.summaries_upserted += len(rows)
+                job.publish()
+
+            # Every file was walked: summaries of files that are gone (or yield no chunks now) are stale
+            job.set_phase("summarizing")
+            stale = sorted(set(vector_store.list_ids(namespace=SUMMARY_NAMESPACE)) - summaries.ids())
+            if stale:
+                vector_store.delete_vectors(stale, namespace=SUMMARY_NAMESPACE)
+                logger.info(f"Deleted {len(stale)} stale document summaries")
+
+            dedup_stats = {
+                "duplicate_paths_skipped": walk_stats.get("duplicate_paths_skipped", 0),
+                "overlapping_roots_pruned": walk_stats.get("overlapping_roots_pruned", 0),
+                **deduplicator.stats()
+            }
+            job.result = _summarize(all_metadatas, timer, dedup_stats, walk_stats)
+            # Cached retrieval results and the namespace list may now be stale in every worker
+            shared_cache.clear("retrieval")
+            vector_store.search_index.forget_namespaces()
+            self._finish(job, checkpoint, "completed")
+
+        except Exception as e:
+            logger.error(f"Ingestion job {job.job_id} failed: {e}")
+            job.error = str(e)
+            self._finish(job, checkpoint, "failed")
+
+    @staticmethod
+    def _finish(job: IngestJob, checkpoint: Optional[IngestCheckpoint], status: str):
+        job.finish(status)
+        if checkpoint is None:
+            logger.warning(f"Ingestion job {job.job_id} {status} before its checkpoint could be opened: {job.error}")
+            return
+        try:
+            checkpoint.append({"event": status, "error": job.error})
+        except OSError as e:
+            logger.warning(f"Could not write checkpoint for job {job.job_id}: {e}")
+        logger.info(f"Ingestion job {job.job_id} {status}: {job.vectors_upserted} vectors upserted")
+
+def collection_for(file_path: str, docs_paths: list[str]) -> str:
+    """Collection of a file: its top-level folder under the most specific docs root containing it."""
+    roots = [os.path.abspath(path) for path in docs_paths]
+    file_path = os.path.abspath(file_path)
+    containing = [root for root in roots if file_path.startswith(root + os.sep)]
+    if not containing:
+        return DEFAULT_COLLECTION
+    relative = os.path.relpath(file_path, max(containing, key=len))
+    parts = relative.split(os.sep)
+    return collection_name(parts[0]) if len(parts) > 1 else DEFAULT_COLLECTION
+
+def _plan_batches(namespaces: list[str], batch_size: int) -> list[tuple[int, int]]:
+    """Split chunk positions into upsert batches of at most batch_size that never span two namespaces."""
+    batches = []
+    start = 0
+    for i in range(1, len(namespaces) + 1):
+        if i == len(namespaces) or namespaces[i] != namespaces[start] or i - start == batch_size:
+            batches.append((start, i))
+            start = i
+    return batches
+
+def _chunk_id(source: str, chunk: int, text: str) -> str:
+    text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return hashlib.sha1(f"{source}|{chunk}|{text_hash}".encode("utf-8")).hexdigest()
+
+def _summarize(all_metadatas: list[dict], timer: ExtractionTimer, dedup_stats: dict, walk_stats: dict) -> dict:
+    """Per-file summary in the shape the synchronous /ingest endpoint used to return."""
+    file_summary = {}
+    for metadata in all_metadatas:
+        source = metadata["source"]
+        if source not in file_summary:
+            file_summary[source] = {
+                "chunks": 0,
+                "file_type": metadata["file_type"],
+                "collection": metadata["collection"]
+            }
+        file_summary[source]["chunks"] += 1
+
+    return {
+        "message": f"Successfully ingested {len(all_metadatas)} document chunks from {len(file_summary)} files",
+        "chunks_count": len(all_metadatas),
+        "files_count": len(file_summary),
+        "walk": walk_stats,
+        "extraction": timer.summary(),
+        "dedup": dedup_stats,
+        "files_processed": [
+            {
+                "filename": os.path.basename(source),
+                "path": source,
+                "chunks": info["chunks"],
+                "file_type": info["file_type"],
+                "collection": info["collection"]
+            }
+            for source, info in file_summary.items()
+        ]
+    }
+
+# Global instance
+ingest_service = IngestService()
@@ -1,9 +1,18 @@
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
+from core.admission import AdmissionRejected, controllers
 from core.config import settings
+from core.profiling import stage, add_stage, record_size
+from core.resilience import bedrock_policy, CircuitOpenError
+from core.retrieval import namespaces_for, normalize_file_types
 from core.vector_store import vector_store
+from services.model_router import model_router
+from services.prompts import build_context, build_prompt
 import json
 import logging
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -15,104 +24,102 @@ class LLMService:
                 'bedrock-runtime',
                 region_name=settings.AWS_REGION,
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                # Retries and the overall deadline are handled by the resilience policy
+                config=Config(
+                    connect_timeout=5,
+                    read_timeout=settings.BEDROCK_TIMEOUT_SECONDS,
+                    retries={"max_attempts": 1, "mode": "standard"}
+                )
             )
             logger.info("Bedrock client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Bedrock client: {e}")
             raise
 
-    def generate_response(self, question: str, conversation_id: str = None) -> dict:
-        """Generate a response using RAG with AWS Bedrock."""
+    def generate_response(self, question: str, conversation_id: str = None,
+                          collections: list[str] = None, file_types: list[str] = None,
+                          deadline: float = None) -> dict:
+        """Generate a response using RAG with AWS Bedrock, optionally restricted to collections and file types.
+
+        Raises AdmissionRejected when Bedrock or retrieval is saturated and the
+        request cannot start before ``deadline`` (a time.monotonic() value).
+        /api/chat has already run the up-front Bedrock check on the event loop.
+        A new conversation gets a fresh id, which the client sends back on later turns.
+        """
+        conversation_id = conversation_id or uuid.uuid4().hex
         try:
-            # Get relevant documents from vector store
+            # Get relevant documents from vector store (already cached if the draft was prefetched)
             logger.info(f"Searching for relevant documents for question: {question}")
-            docs = vector_store.similarity_search(question, k=3)
+            with stage("retrieval"), controllers["retrieval"].slot(deadline):
+                docs = self.retrieve(question, collections=collections, file_types=file_types)
             logger.info(f"Found {len(docs)} relevant documents")
+            record_size("retrieved_docs", len(docs))
+            prompt_started = time.perf_counter()
 
             sources = [doc.get("metadata", {}).get("source", "Unknown") for doc in docs]
 
-            # Prepare context from retrieved documents
-            context_parts = []
-            for i, doc in enumerate(docs, 1):
-                content = doc.get("page_content", "")
-                source = doc.get("metadata", {}).get("source", "Unknown")
-                context_parts.append(f"Documento {i} ({source}):\n{content}")
-
-            context = "\n\n".join(context_parts)
+            # Prepare context from retrieved documents and the prompt for Claude
+            context = build_context(docs)
             logger.info(f"Prepared context with {len(context)} characters")
-
-            # Create prompt for Claude with structured formatting
-            prompt = f"""Eres un Asistente Técnico Experto con enfoque en UX (Experiencia de Usuario) especializado en sostenibilidad financiera de BBVA.
-Tu objetivo es responder preguntas técnicas basándote en los documentos proporcionados, asegurando que la lectura sea escaneable, clara y visualmente estructurada.
-
-Pregunta del usuario: {question}
-
-Información relevante de los documentos:
-{context}
-
-REGLAS DE FORMATO Y ESTILO (ESTRICTO):
-
-1. ESTRUCTURA VISUAL DEL TEXTO:
-   - NO generes bloques de texto plano o párrafos infinitos
-   - Usa listas con viñetas (- o *) para enumerar características, pasos o requisitos
-   - Usa negritas (**texto**) para resaltar conceptos clave, nombres de librerías o términos importantes
-   - Usa encabezados (### Título) para separar secciones lógicas
-
-2. MANEJO DE ENLACES:
-   - Si la información contiene una URL, formatearla como enlace Markdown clickeable
-   - Formato: [Texto descriptivo](URL)
-
-3. REFERENCIA A DOCUMENTOS:
-   - Cuando menciones fuentes, resáltalas visualmente
-   - Usa formato distintivo como: *Fuente: **[Nombre del documento.pdf]***
-
-4. CONTENIDO Y ESTILO:
-   - Responde en español
-   - Sé específico y preciso con los datos
-   - Mantén un tono profesional y experto
-   - Si no encuentras información relevante, indica claramente que no tienes datos suficientes
-
-EJEMPLO DE ESTRUCTURA ESPERADA:
-### Definición del Concepto
-Explicación clara y concisa del tema principal.
-
-### Características Principales
-- **Característica 1:** Descripción detallada
-- **Característica 2:** Información adicional
-- **Característica 3:** Detalles técnicos
-
-### Pasos para Implementación
-1. Primer paso con instrucciones claras
-2. Segundo paso con requisitos específicos
-3. Tercer paso con consideraciones importantes
-
-*Fuente: **[Documento de referencia.pdf]***
-
-Respuesta:"""
+            prompt = build_prompt(question, context)
+            add_stage("prompt", time.perf_counter() - prompt_started)
+            record_size("context_chars", len(context))
+            record_size("prompt_chars", len(prompt))
+
+            # Route to the fastest model that meets this request's quality tier
+            with stage("routing"):
+                route = model_router.route(
+                    question,
+                    retrieval_scores=[doc.get("metadata", {}).get("score", 0.0) for doc in docs],
+                    conversation_id=conversation_id
+                )
 
             # Call Bedrock
-            logger.info("Calling AWS Bedrock for response generation")
-            response = self._call_bedrock(prompt)
+            logger.info(f"Calling AWS Bedrock ({route.model_id}, class={route.request_class}) for response generation")
+            with controllers["bedrock"].slot(deadline):
+                started = time.perf_counter()
+                try:
+                    with stage("bedrock"):
+                        response = self._call_bedrock(prompt, model_id=route.model_id)
+                except Exception:
+                    model_router.record(route.model_id, time.perf_counter() - started, success=False)
+                    raise
+                model_router.record(route.model_id, time.perf_counter() - started)
             logger.info("Successfully generated response from Bedrock")
+            record_size("response_chars", len(response))
 
             return {
                 "response": response,
-                "conversation_id": conversation_id or "default",
-                "sources": sources
+                "conversation_id": conversation_id,
+                "sources": sources,
+                "model": route.model_id
             }
 
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             # Fallback response when everything fails
             return {
                 "response": f"Lo siento, ocurrió un error al procesar tu pregunta. Error: {str(e)}",
-                "conversation_id": conversation_id or "default",
-                "sources": []
+                "conversation_id": conversation_id,
+                "sources": [],
+                "model": None
             }
 
-    def _call_bedrock(self, prompt: str) -> str:
-        """Call AWS Bedrock Claude model."""
+    def retrieve(self, question: str, collections: list[str] = None, file_types: list[str] = None) -> list[dict]:
+        """Retrieval step of generate_response; /api/prefetch runs it early with the same parameters."""
+        return vector_store.max_marginal_relevance_search(
+            question,
+            k=settings.RETRIEVAL_K,
+            namespaces=namespaces_for(collections),
+            file_types=normalize_file_types(file_types) if file_types else None
+        )
+
+    def _call_bedrock(self, prompt: str, model_id: str = None) -> str:
+        """Call an AWS Bedrock Claude model (BEDROCK_MODEL_ID unless routed elsewhere)."""
+        model_id = model_id or settings.BEDROCK_MODEL_ID
         try:
             # Prepare the request body for Claude
             body = {
@@ -128,18 +135,13 @@ Respuesta:"""
                 "top_p": 0.9
             }
 
-            # Call Bedrock
-            response = self.bedrock_client.invoke_model(
-                modelId=settings.BEDROCK_MODEL_ID,
-                body=json.dumps(body),
-                contentType='application/json',
-                accept='application/json'
-            )
-
-            # Parse response
-            response_body = json.loads(response['body'].read())
+            # Call Bedrock with timeout, retries and circuit breaker
+            response_body = bedrock_policy(model_id).call(self._invoke_model, model_id, json.dumps(body))
             return response_body['content'][0]['text']
 
+        except CircuitOpenError as e:
+            logger.error(f"AWS Bedrock unavailable: {e}")
+            raise Exception(f"Bedrock is temporarily unavailable: {str(e)}")
         except (BotoCoreError, ClientError) as e:
             logger.error(f"AWS Bedrock error: {e}")
             raise Exception(f"Error calling Bedrock: {str(e)}")
@@ -147,5 +149,19 @@ Respuesta:"""
             logger.error(f"Unexpected error calling Bedrock: {e}")
             raise
 
+    def _invoke_model(self, model_id: str, body: str) -> dict:
+        """Single Bedrock attempt; reading the body is part of it so a stalled stream also times out."""
+        with stage("bedrock.invoke"):
+            response = self.bedrock_client.invoke_model(
+                modelId=model_id,
+                body=body,
+                contentType='application/json',
+                accept='application/json'
+            )
+            raw = response['body'].read()
+        record_size("bedrock_response_bytes", len(raw))
+        with stage("bedrock.parse"):
+            return json.loads(raw)
+
 # Global instance
 llm_service = LLMService()
\ No newline at end of file
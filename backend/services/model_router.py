@@ -0,0 +1,121 @@
+import logging
+import random
+import re
+import threading
+from collections import OrderedDict
+from core.config import settings
+from core.metrics import metrics
+from core.resilience import bedrock_policy
+from core.shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Minimum model tier per request class
+CLASS_TIERS = {"simple": 1, "standard": 2, "complex": 2}
+
+# Phrases that signal analysis or comparison rather than a definition lookup
+_COMPLEX_MARKERS = re.compile(
+    r"\b(compara\w*|diferencia\w*|analiza\w*|por qué|porque|explica\w*|evalú\w*|ventajas|desventajas|impacto|estrategia)\b",
+    re.IGNORECASE
+)
+
+class ModelRoute:
+    """Routing decision for one request."""
+
+    def __init__(self, model_id: str, request_class: str, required_tier: int):
+        self.model_id = model_id
+        self.request_class = request_class
+        self.required_tier = required_tier
+
+class ModelRouter:
+    """Sends each request to the fastest pooled Bedrock model that meets its quality tier.
+
+    Requests are classified from cheap features (question length, best
+    retrieval score, conversation depth). Latency is tracked per model as an
+    exponentially weighted moving average; a small exploration rate keeps the
+    estimates of non-preferred models fresh.
+    """
+
+    def __init__(self, pool: list[dict], ewma_alpha: float = 0.2, explore_rate: float = 0.05,
+                 max_conversations: int = 10000, rng: random.Random = None):
+        self.pool = sorted(pool, key=lambda model: model["tier"])
+        self.ewma_alpha = ewma_alpha
+        self.explore_rate = explore_rate
+        self.max_conversations = max_conversations
+        self.rng = rng or random.Random()
+        self._latency = {model["id"]: float(model.get("expected_latency", 5.0)) for model in self.pool}
+        self._conversation_turns = OrderedDict()
+        self._lock = threading.Lock()
+
+    def classify(self, question: str, top_score: float = None, depth: int = 0) -> str:
+        """Bucket a request into simple / standard / complex."""
+        length = len(question)
+        if length > settings.ROUTING_COMPLEX_MIN_CHARS or depth >= settings.ROUTING_COMPLEX_MIN_DEPTH \
+                or _COMPLEX_MARKERS.search(question):
+            return "complex"
+        if length <= settings.ROUTING_SIMPLE_MAX_CHARS and depth <= 1 \
+                and top_score is not None and top_score >= settings.ROUTING_SIMPLE_MIN_SCORE:
+            return "simple"
+        return "standard"
+
+    def route(self, question: str, retrieval_scores: list[float] = None, conversation_id: str = None) -> ModelRoute:
+        """Pick a model for this request and count the conversation turn."""
+        depth = self._next_turn(conversation_id)
+        top_score = max(retrieval_scores) if retrieval_scores else None
+        request_class = self.classify(question, top_score, depth)
+        required_tier = CLASS_TIERS[request_class]
+
+        eligible = [model["id"] for model in self.pool if model["tier"] >= required_tier]
+        if not eligible:
+            # Nothing configured at this tier; the strongest model is the best we have
+            eligible = [self.pool[-1]["id"]]
+
+        # Skip models whose circuit is open, unless that leaves nothing; once the reset timeout
+        # has passed the model is eligible again so its half-open trial can actually happen
+        healthy = [model_id for model_id in eligible if not bedrock_policy(model_id).breaker.is_open()]
+        candidates = healthy or eligible
+
+        with self._lock:
+            if len(candidates) > 1 and self.rng.random() < self.explore_rate:
+                model_id = self.rng.choice(candidates)
+            else:
+                model_id = min(candidates, key=lambda candidate: self._latency[candidate])
+
+        metrics.increment(f"routing.class.{request_class}")
+        metrics.increment(f"routing.model.{model_id}")
+        return ModelRoute(model_id, request_class, required_tier)
+
+    def record(self, model_id: str, latency: float, success: bool = True):
+        """Fold an observed call latency into the model's rolling estimate."""
+        metrics.observe(f"bedrock.latency.{model_id}", latency)
+        metrics.increment(f"bedrock.requests.{model_id}")
+        if not success:
+            metrics.increment(f"bedrock.errors.{model_id}")
+            return
+        with self._lock:
+            previous = self._latency.get(model_id, latency)
+            self._latency[model_id] = (1 - self.ewma_alpha) * previous + self.ewma_alpha * latency
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                model["id"]: {"tier": model["tier"], "latency_ewma": round(self._latency[model["id"]], 3)}
+                for model in self.pool
+            }
+
+    def _next_turn(self, conversation_id: str) -> int:
+        if not conversation_id:
+            return 0
+        # Counted across workers when the shared cache is available, since turns land on any worker
+        depth = shared_cache.increment("conversations", conversation_id, ttl=settings.CONVERSATION_TTL_SECONDS)
+        if depth is not None:
+            return depth
+        with self._lock:
+            depth = self._conversation_turns.pop(conversation_id, 0)
+            self._conversation_turns[conversation_id] = depth + 1
+            while len(self._conversation_turns) > self.max_conversations:
+                self._conversation_turns.popitem(last=False)
+            return depth
+
+# Global instance
+model_router = ModelRouter(settings.BEDROCK_MODEL_POOL)
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from core.admission import AdmissionRejected, controllers
+from core.config import settings
+from core.metrics import metrics
+from core.retrieval import normalize_query
+from core.shared_cache import shared_cache
+from services.llm_service import llm_service
+
+logger = logging.getLogger(__name__)
+
+class PrefetchService:
+    """Runs retrieval for a question draft while the user is still typing.
+
+    The client debounces keystrokes before sending a draft; here each new
+    draft of a session supersedes the previous one if that is still waiting
+    for a worker. Retrieval goes through ``llm_service.retrieve``, so its
+    result lands in the shared retrieval cache under the normalized question;
+    a matching /api/chat then reads it (or waits on the in-flight lookup)
+    instead of embedding and querying Pinecone again.
+    """
+
+    def __init__(self, min_chars: int, workers: int, max_sessions: int = 1000):
+        self.min_chars = min_chars
+        self.max_sessions = max_sessions
+        self._pending: dict[str, asyncio.Task] = {}
+        self._drafts: dict[str, str] = {}
+        # Bounded so prefetches never take threads from /api/chat
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+
+    def schedule(self, session_id: str, text: str, collections: list[str] = None, file_types: list[str] = None) -> str:
+        """Queue a draft for retrieval, superseding the session's previous draft. Must run on the event loop."""
+        draft = normalize_query(text)
+        # Without the shared cache the result would be stored nowhere /api/chat can read it
+        if not settings.PREFETCH_ENABLED or not shared_cache.enabled:
+            return "disabled"
+        if len(draft) < self.min_chars:
+            return "too_short"
+        if self._drafts.get(session_id) == draft:
+            return "unchanged"
+
+        previous = self._pending.pop(session_id, None)
+        if previous is not None and not previous.done():
+            previous.cancel()
+            metrics.increment("prefetch.superseded")
+        if len(self._pending) >= self.max_sessions:
+            logger.warning("Too many pending prefetch sessions, dropping draft")
+            metrics.increment("prefetch.dropped")
+            return "dropped"
+
+        self._drafts[session_id] = draft
+        self._pending[session_id] = asyncio.get_running_loop().create_task(
+            self._run(session_id, text, collections, file_types)
+        )
+        metrics.increment("prefetch.scheduled")
+        return "scheduled"
+
+    async def _run(self, session_id: str, text: str, collections: list[str], file_types: list[str]):
+        try:
+            # Cancelling while queued for a worker drops the draft; once running, the retrieval is not
+            # interrupted and a superseded result is still a valid cache entry
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._retrieve, text, collections, file_types)
+            metrics.increment("prefetch.completed")
+        except asyncio.CancelledError:
+            pass
+        except AdmissionRejected:
+            metrics.increment("prefetch.shed")
+        except Exception as e:
+            logger.warning(f"Prefetch failed: {e}")
+            metrics.increment("prefetch.errors")
+        finally:
+            if self._pending.get(session_id) is asyncio.current_task():
+                del self._pending[session_id]
+                self._drafts.pop(session_id, None)
+
+    @staticmethod
+    def _retrieve(text: str, collections: list[str], file_types: list[str]):
+        # Speculative work never queues behind real chat requests
+        with controllers["retrieval"].slot(wait=False):
+            llm_service.retrieve(text, collections=collections, file_types=file_types)
+
+# Global instance
+prefetch_service = PrefetchService(
+    min_chars=settings.PREFETCH_MIN_CHARS,
+    workers=settings.PREFETCH_WORKERS
+)
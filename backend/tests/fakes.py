@@ -0,0 +1,44 @@
+import threading
+
+class FakeClientError(Exception):
+    """Shaped like botocore's ClientError, which core.resilience.is_retryable inspects."""
+
+    def __init__(self, code: str, status: int):
+        super().__init__(f"{code} ({status})")
+        self.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+
+class FaultInjectingFake:
+    """Stand-in for a Bedrock or Pinecone client call that plays a script of outcomes.
+
+    Each call takes the next step of ``script`` (the last one repeats):
+    ``"throttle"`` (429 ThrottlingException), ``"5xx"`` (503),
+    ``"4xx"`` (400 ValidationException), ``"stall"`` (blocks until
+    ``release()`` or ``stall_seconds``, then answers) or ``"ok"``.
+    """
+
+    def __init__(self, script: list[str], result="ok", stall_seconds: float = 5.0):
+        self.script = list(script)
+        self.result = result
+        self.stall_seconds = stall_seconds
+        self.calls = 0
+        self._released = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            step = self.script[min(self.calls, len(self.script) - 1)]
+            self.calls += 1
+        if step == "throttle":
+            raise FakeClientError("ThrottlingException", 429)
+        if step == "5xx":
+            raise FakeClientError("ServiceUnavailableException", 503)
+        if step == "4xx":
+            raise FakeClientError("ValidationException", 400)
+        if step == "stall":
+            self._released.wait(self.stall_seconds)
+            return f"stalled {self.result}"
+        return self.result
+
+    def release(self):
+        """Let stalled calls finish, so they don't hold executor threads after a test."""
+        self._released.set()
@@ -0,0 +1,89 @@
+import threading
+import time
+import pytest
+from core.admission import AdmissionController, AdmissionRejected, ThreadGate
+
+def wait_for_queue(controller: AdmissionController, depth: int, timeout: float = 2.0):
+    stop = time.monotonic() + timeout
+    while controller.snapshot()["queue_depth"] < depth:
+        assert time.monotonic() < stop, "waiters never queued"
+        time.sleep(0.001)
+
+def queue_in_thread(controller: AdmissionController, deadline: float, served: list, name: str) -> threading.Thread:
+    def run():
+        with controller.slot(deadline):
+            served.append(name)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_freed_slots_go_to_the_earliest_deadline_first():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=5, service_time=0.001)
+    now = time.monotonic()
+    served = []
+    holder = controller.slot()
+    holder.__enter__()
+
+    threads = []
+    for name, offset in [("late", 50), ("early", 10), ("middle", 30)]:
+        threads.append(queue_in_thread(controller, now + offset, served, name))
+        wait_for_queue(controller, len(threads))
+
+    holder.__exit__(None, None, None)
+    for thread in threads:
+        thread.join(timeout=2)
+    assert served == ["early", "middle", "late"]
+    assert controller.snapshot()["in_flight"] == 0
+
+def test_rejects_with_queue_full_when_the_queue_is_at_capacity():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=1, service_time=0.001)
+    served = []
+    holder = controller.slot()
+    holder.__enter__()
+    thread = queue_in_thread(controller, time.monotonic() + 10, served, "queued")
+    wait_for_queue(controller, 1)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.check(time.monotonic() + 10)
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= 1
+
+    holder.__exit__(None, None, None)
+    thread.join(timeout=2)
+    assert served == ["queued"]
+
+def test_rejects_up_front_when_the_expected_wait_overruns_the_deadline():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=5, service_time=10.0)
+    with controller.slot():
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.slot(time.monotonic() + 1):
+                pass
+    assert rejected.value.reason == "deadline"
+
+def test_queued_request_is_dropped_when_its_deadline_passes():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=5, service_time=0.001)
+    with controller.slot():
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.slot(time.monotonic() + 0.05):
+                pass
+        assert controller.snapshot()["queue_depth"] == 0
+    assert rejected.value.reason == "deadline"
+    assert controller.snapshot()["in_flight"] == 0
+
+def test_no_wait_requests_are_rejected_when_busy():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=5)
+    with controller.slot():
+        with pytest.raises(AdmissionRejected) as rejected:
+            with controller.slot(wait=False):
+                pass
+    assert rejected.value.reason == "busy"
+
+def test_thread_gate_sheds_beyond_capacity_and_frees_places():
+    gate = ThreadGate("test-gate", capacity=2, downstream=AdmissionController("test", 1, 1))
+    with gate.reserve(), gate.reserve():
+        with pytest.raises(AdmissionRejected) as rejected:
+            with gate.reserve():
+                pass
+        assert rejected.value.reason == "queue_full"
+    with gate.reserve():
+        assert gate.snapshot() == {"reserved": 1, "capacity": 2}
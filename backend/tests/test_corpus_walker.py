@@ -0,0 +1,44 @@
+from utils.corpus_walker import CorpusWalker
+
+def write(path, content: bytes = b"some text"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+def accepted(walker: CorpusWalker, root) -> list[str]:
+    return sorted(str(path)[len(str(root.resolve())) + 1:] for path, _, _ in walker.walk())
+
+def test_excluded_and_hidden_directories_are_pruned(tmp_path):
+    write(tmp_path / "docs" / "report.txt")
+    write(tmp_path / "node_modules" / "pkg" / "readme.txt")
+    write(tmp_path / ".git" / "notes.txt")
+    write(tmp_path / "frontend" / "copy.txt")
+
+    walker = CorpusWalker([str(tmp_path)], [".txt"], exclude_globs=["frontend/*"], exclude_dirs=["node_modules"])
+
+    assert accepted(walker, tmp_path) == ["docs/report.txt"]
+    assert walker.stats["dirs_pruned"] == 3
+    # Pruned directories are never descended into
+    assert walker.stats["dirs_scanned"] == 2
+
+def test_files_are_filtered_by_extension_size_and_content(tmp_path):
+    write(tmp_path / "notes.txt")
+    write(tmp_path / "image.png")
+    write(tmp_path / "big.txt", b"x" * 2048)
+    write(tmp_path / "binary.txt", b"text\x00more")
+    write(tmp_path / "fake.pdf", b"not a pdf")
+
+    walker = CorpusWalker([str(tmp_path)], [".txt", ".pdf"], max_file_bytes=1024)
+
+    assert accepted(walker, tmp_path) == ["notes.txt"]
+    assert walker.stats["skipped_extension"] == 1
+    assert walker.stats["skipped_oversized"] == 1
+    assert walker.stats["skipped_binary"] == 2
+
+def test_nested_root_is_walked_once(tmp_path):
+    write(tmp_path / "a.txt")
+    write(tmp_path / "inner" / "b.txt")
+
+    walker = CorpusWalker([str(tmp_path), str(tmp_path / "inner")], [".txt"])
+
+    assert accepted(walker, tmp_path) == ["a.txt", "inner/b.txt"]
+    assert walker.stats["overlapping_roots_pruned"] == 1
@@ -0,0 +1,41 @@
+from utils.dedup import ChunkDeduplicator
+
+REPORT = (
+    "The sustainability report describes how the company measured its carbon footprint during the last "
+    "fiscal year across offices warehouses and the delivery fleet. Scope one emissions come mostly from "
+    "diesel trucks while scope two emissions follow the electricity bought for the main distribution "
+    "center. The audit team reviewed invoices meter readings and travel records before publishing the "
+    "consolidated figures. Several measures were proposed to reduce energy use including rooftop solar "
+    "panels better insulation for cold storage and route planning software for drivers. Suppliers were "
+    "asked to share their own emissions so that scope three can be estimated with less uncertainty next "
+    "year. The board approved a plan that links part of management compensation to progress on these "
+    "targets and asked for quarterly updates on water waste and biodiversity indicators as well."
+)
+
+def test_exact_duplicates_ignore_whitespace():
+    dedup = ChunkDeduplicator()
+
+    assert dedup.check(REPORT) is None
+    assert dedup.check("  " + REPORT.replace(". ", ".\n\n")) == "exact"
+    assert dedup.stats()["exact_duplicate_chunks"] == 1
+
+def test_near_duplicates_are_caught():
+    dedup = ChunkDeduplicator()
+
+    assert dedup.check(REPORT) is None
+    assert dedup.check(REPORT.replace("quarterly updates", "regular updates")) == "near"
+    assert dedup.stats()["near_duplicate_chunks"] == 1
+
+def test_chunks_that_differ_in_their_numbers_are_kept():
+    dedup = ChunkDeduplicator()
+    row = "Plant {} reported {} tonnes of CO2 and {} cubic meters of water in 2023. " + REPORT
+
+    assert dedup.check(row.format("Norte", 1520, 300)) is None
+    assert dedup.check(row.format("Norte", 1530, 300)) is None
+    assert dedup.stats()["near_duplicate_chunks"] == 0
+
+def test_unrelated_text_is_kept():
+    dedup = ChunkDeduplicator()
+
+    assert dedup.check(REPORT) is None
+    assert dedup.check(" ".join(reversed(REPORT.split()))) is None
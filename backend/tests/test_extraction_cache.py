@@ -0,0 +1,35 @@
+import json
+import os
+from utils.extraction_cache import ExtractionCache
+
+def cached_file(cache: ExtractionCache, directory, name: str, text: str) -> str:
+    path = directory / name
+    path.write_text(text, encoding="utf-8")
+    key = cache.fingerprint(str(path), ".txt")
+    cache.put(key, {"text": text, "chunks": {}})
+    return key
+
+def test_unchanged_file_is_resolved_from_the_index(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=1_000_000)
+    key = cached_file(cache, tmp_path, "a.txt", "hello world")
+
+    assert cache.fingerprint(str(tmp_path / "a.txt"), ".txt") == key
+    assert cache.get(key) == {"text": "hello world", "chunks": {}}
+
+def test_eviction_removes_index_entries_with_their_blobs(tmp_path):
+    # Room for about two compressed entries of incompressible text
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=2500)
+    keys = []
+    for i in range(4):
+        keys.append(cached_file(cache, tmp_path, f"{i}.txt", os.urandom(600).hex()))
+        # Distinct mtimes so eviction order is deterministic
+        blob = cache._blob_path(keys[-1])
+        os.utime(blob, (i, i))
+
+    live = {key for key in keys if cache.get(key) is not None}
+    assert 0 < len(live) < len(keys)
+    indexed = set()
+    for name in os.listdir(cache.index_dir):
+        with open(os.path.join(cache.index_dir, name), encoding="utf-8") as f:
+            indexed.add(json.load(f)["key"])
+    assert indexed == live
@@ -0,0 +1,184 @@
+import pytest
+from core.resilience import CircuitBreaker, CircuitOpenError, DependencyBusy, DependencyTimeout, ResiliencePolicy
+from tests.fakes import FakeClientError, FaultInjectingFake
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_policy(**kwargs) -> ResiliencePolicy:
+    sleeps = []
+    kwargs.setdefault("timeout", 1.0)
+    policy = ResiliencePolicy("fake", sleep=sleeps.append, **kwargs)
+    policy.sleeps = sleeps
+    return policy
+
+@pytest.fixture
+def fakes():
+    """Factory for fakes that are released after the test, so stalled calls don't linger."""
+    created = []
+
+    def make(script: list[str], **kwargs) -> FaultInjectingFake:
+        fake = FaultInjectingFake(script, **kwargs)
+        created.append(fake)
+        return fake
+
+    yield make
+    for fake in created:
+        fake.release()
+
+def test_retries_throttling_and_5xx(fakes):
+    fake = fakes(["throttle", "5xx", "ok"])
+    policy = make_policy(max_attempts=3)
+
+    assert policy.call(fake) == "ok"
+    assert fake.calls == 3
+    assert policy.stats["retries"] == 2
+    assert len(policy.sleeps) == 2
+    assert policy.breaker.state == "closed"
+
+def test_gives_up_after_max_attempts(fakes):
+    fake = fakes(["5xx"])
+    policy = make_policy(max_attempts=3)
+
+    with pytest.raises(FakeClientError):
+        policy.call(fake)
+    assert fake.calls == 3
+    assert policy.stats["failures"] == 1
+
+def test_client_errors_are_not_retried_and_keep_the_circuit_closed(fakes):
+    fake = fakes(["4xx", "ok"])
+    policy = make_policy(max_attempts=3, breaker=CircuitBreaker("fake", failure_threshold=1))
+
+    with pytest.raises(FakeClientError):
+        policy.call(fake)
+    assert fake.calls == 1
+    assert policy.breaker.state == "closed"
+
+def test_stalled_call_times_out_and_is_retried(fakes):
+    fake = fakes(["stall", "ok"])
+    policy = make_policy(timeout=0.05, max_attempts=2)
+
+    assert policy.call(fake) == "ok"
+    assert policy.stats["timeouts"] == 1
+    assert policy.stats["retries"] == 1
+
+def test_timeouts_are_not_retried_when_the_call_is_not_idempotent(fakes):
+    fake = fakes(["stall", "ok"])
+    policy = make_policy(timeout=0.05, max_attempts=3, retry_timeouts=False)
+
+    with pytest.raises(DependencyTimeout):
+        policy.call(fake)
+    assert fake.calls == 1
+    assert policy.stats["retries"] == 0
+
+def test_throttling_is_still_retried_when_timeouts_are_not(fakes):
+    fake = fakes(["throttle", "ok"])
+    policy = make_policy(max_attempts=2, retry_timeouts=False)
+
+    assert policy.call(fake) == "ok"
+    assert fake.calls == 2
+
+def test_programming_errors_are_not_retried_and_keep_the_circuit_closed():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        return None.missing
+
+    policy = make_policy(max_attempts=3, breaker=CircuitBreaker("fake", failure_threshold=1))
+    with pytest.raises(AttributeError):
+        policy.call(broken)
+    assert len(calls) == 1
+    assert policy.breaker.state == "closed"
+
+def test_connection_errors_are_retried():
+    outcomes = [ConnectionResetError("reset"), "ok"]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert make_policy(max_attempts=2).call(flaky) == "ok"
+
+def test_stalled_calls_only_tie_up_their_own_workers(fakes):
+    stalled = fakes(["stall"])
+    policy = make_policy(timeout=0.05, max_attempts=1, max_workers=1)
+    other = make_policy(max_workers=1)
+
+    with pytest.raises(DependencyTimeout):
+        policy.call(stalled)
+    # The abandoned call still holds the only worker: fail fast rather than queue behind it
+    with pytest.raises(DependencyBusy):
+        policy.call(fakes(["ok"]))
+    assert policy.stats["busy"] == 1
+    assert other.call(fakes(["ok"])) == "ok"
+
+    stalled.release()
+    policy._executor.shutdown(wait=True)
+    assert policy.snapshot()["busy_workers"] == 0
+
+def test_stall_on_every_attempt_raises_timeout(fakes):
+    fake = fakes(["stall"])
+    policy = make_policy(timeout=0.05, max_attempts=2)
+
+    with pytest.raises(DependencyTimeout):
+        policy.call(fake)
+
+def test_breaker_opens_then_half_open_trial_closes_it(fakes):
+    clock = FakeClock()
+    breaker = CircuitBreaker("fake", failure_threshold=2, reset_timeout=10.0, clock=clock)
+    policy = make_policy(max_attempts=1, breaker=breaker)
+    failing = fakes(["5xx"])
+
+    for _ in range(2):
+        with pytest.raises(FakeClientError):
+            policy.call(failing)
+    assert breaker.state == "open"
+    assert breaker.is_open()
+
+    # Rejected without calling the dependency
+    with pytest.raises(CircuitOpenError):
+        policy.call(failing)
+    assert failing.calls == 2
+
+    clock.now = 10.0
+    assert not breaker.is_open()
+    assert policy.call(fakes(["ok"])) == "ok"
+    assert breaker.state == "closed"
+
+def test_failed_half_open_trial_reopens_the_circuit(fakes):
+    clock = FakeClock()
+    breaker = CircuitBreaker("fake", failure_threshold=1, reset_timeout=10.0, clock=clock)
+    policy = make_policy(max_attempts=1, breaker=breaker)
+
+    with pytest.raises(FakeClientError):
+        policy.call(fakes(["throttle"]))
+    clock.now = 10.0
+    with pytest.raises(FakeClientError):
+        policy.call(fakes(["5xx"]))
+    assert breaker.state == "open"
+    assert breaker.is_open()
+
+def test_hedge_wins_over_stalled_primary(fakes):
+    fake = fakes(["stall", "ok"])
+    policy = make_policy(timeout=2.0, max_attempts=1, hedge_after=0.02)
+
+    assert policy.call(fake) == "ok"
+    assert fake.calls == 2
+    assert policy.stats["hedges"] == 1
+    assert policy.stats["hedge_wins"] == 1
+    assert policy.stats["timeouts"] == 0
+
+def test_fast_primary_is_not_hedged(fakes):
+    fake = fakes(["ok"])
+    policy = make_policy(timeout=2.0, hedge_after=0.5)
+
+    assert policy.call(fake) == "ok"
+    assert fake.calls == 1
+    assert policy.stats["hedges"] == 0
@@ -0,0 +1,52 @@
+from core.retrieval import mmr_select, search_matches, searchable_namespaces
+
+class FakeIndex:
+    """Pinecone-shaped index holding one match per namespace."""
+
+    def __init__(self, namespaces: list[str]):
+        self.namespaces = namespaces
+        self.queried = []
+
+    def list_namespaces(self) -> list[str]:
+        return self.namespaces
+
+    def query(self, namespace: str, **kwargs):
+        self.queried.append(namespace)
+        return {"matches": [{"id": f"{namespace or 'default'}-1", "score": 0.5, "metadata": {}}]}
+
+def test_legacy_namespace_is_searched_only_until_collections_exist():
+    assert searchable_namespaces([]) == [""]
+    assert searchable_namespaces([""]) == [""]
+    assert searchable_namespaces(["", "general", "reports"]) == ["general", "reports"]
+
+def test_unfiltered_search_skips_the_legacy_namespace():
+    index = FakeIndex(["", "general"])
+    matches = search_matches(index, [0.1, 0.2], top_k=5)
+
+    assert index.queried == ["general"]
+    assert [match["id"] for match in matches] == ["general-1"]
+
+def test_default_collection_can_still_be_requested():
+    index = FakeIndex(["", "general"])
+    search_matches(index, [0.1, 0.2], top_k=5, namespaces=[""])
+
+    assert index.queried == [""]
+
+def test_mmr_prefers_a_diverse_second_result():
+    query = [1.0, 0.3, 0.3]
+    # The first two candidates are close to each other; the last is less relevant but different
+    candidates = [[1.0, 0.0, 0.0], [0.95, 0.3, 0.0], [0.6, 0.2, 0.8]]
+    scores = [0.9, 0.9, 0.8]
+
+    assert mmr_select(query, candidates, scores, k=2, lambda_mult=0.5) == [1, 2]
+    # Pure relevance ignores diversity
+    assert mmr_select(query, candidates, scores, k=2, lambda_mult=1.0) == [1, 0]
+
+def test_mmr_drops_near_identical_and_low_scoring_candidates():
+    query = [1.0, 0.0]
+    candidates = [[1.0, 0.0], [1.0, 0.001], [0.0, 1.0]]
+
+    assert mmr_select(query, candidates, [0.9, 0.9, 0.1], k=3, score_threshold=0.5) == [0]
+    # Below the threshold, the best min_k candidates are still returned
+    assert mmr_select(query, candidates, [0.2, 0.2, 0.1], k=3, score_threshold=0.5, min_k=1) == [0]
+    assert mmr_select(query, [], [], k=3) == []
@@ -0,0 +1,82 @@
+import threading
+import time
+from core.eviction import eviction_victims
+from core.shared_cache import SharedCache
+
+def make_cache(tmp_path, **kwargs) -> SharedCache:
+    kwargs.setdefault("max_bytes", 1_000_000)
+    return SharedCache(str(tmp_path / "cache.sqlite3"), **kwargs)
+
+def test_concurrent_misses_compute_once_across_workers(tmp_path):
+    # One instance per "worker", all sharing the same database file
+    workers = [make_cache(tmp_path) for _ in range(4)]
+    computes = []
+    started = threading.Barrier(len(workers))
+    results = []
+
+    def compute():
+        computes.append(1)
+        time.sleep(0.2)
+        return {"answer": 42}
+
+    def run(cache):
+        started.wait()
+        results.append(cache.get_or_compute("retrieval", "q", compute, ttl=60))
+
+    threads = [threading.Thread(target=run, args=(cache,)) for cache in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(computes) == 1
+    assert results == [{"answer": 42}] * len(workers)
+
+def test_expired_lease_of_a_dead_worker_is_taken_over(tmp_path):
+    dead = make_cache(tmp_path, lease_seconds=0.05)
+    assert dead._acquire_lease("retrieval", "q")
+
+    cache = make_cache(tmp_path, lease_seconds=0.05)
+    time.sleep(0.1)
+    assert cache.get_or_compute("retrieval", "q", lambda: "fresh", ttl=60) == "fresh"
+    assert cache.get("retrieval", "q") == "fresh"
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute("retrieval", "q", compute, ttl=0.05) == 1
+    assert cache.get_or_compute("retrieval", "q", compute, ttl=0.05) == 1
+    time.sleep(0.1)
+    assert cache.get("retrieval", "q") is None
+    assert cache.get_or_compute("retrieval", "q", compute, ttl=0.05) == 2
+
+def test_none_results_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.get_or_compute("retrieval", "q", lambda: None, ttl=60)
+    assert cache.get_or_compute("retrieval", "q", lambda: "later", ttl=60) == "later"
+
+def test_disabled_cache_always_computes(tmp_path):
+    cache = make_cache(tmp_path, enabled=False)
+    assert cache.get_or_compute("retrieval", "q", lambda: 1, ttl=60) == 1
+    assert cache.get_or_compute("retrieval", "q", lambda: 2, ttl=60) == 2
+
+def test_eviction_victims_go_down_to_the_low_water_mark():
+    entries = [(10, "a"), (10, "b"), (10, "c"), (10, "d")]
+    assert eviction_victims(entries, total_bytes=40, max_bytes=40) == []
+    # Over a 30 byte cap: evict until at most 27 bytes remain
+    assert eviction_victims(entries, total_bytes=40, max_bytes=30) == ["a", "b"]
+
+def test_increment_counts_across_workers_and_restarts_after_ttl(tmp_path):
+    first, second = make_cache(tmp_path), make_cache(tmp_path)
+
+    assert first.increment("conversations", "c1", ttl=0.2) == 0
+    assert second.increment("conversations", "c1", ttl=0.2) == 1
+    assert first.increment("conversations", "c1", ttl=0.2) == 2
+    time.sleep(0.3)
+    assert second.increment("conversations", "c1", ttl=0.2) == 0
+    assert make_cache(tmp_path, enabled=False).increment("conversations", "c1", ttl=0.2) is None
@@ -0,0 +1,173 @@
+import fnmatch
+import logging
+import os
+import time
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the container formats we parse; anything else with these extensions is skipped
+_MAGIC = {
+    ".pdf": (b"%PDF",),
+    ".xlsx": (b"PK\x03\x04",),
+    ".docx": (b"PK\x03\x04",),
+    ".pptx": (b"PK\x03\x04",),
+    ".xls": (b"\xd0\xcf\x11\xe0",),
+}
+_TEXT_EXTENSIONS = {".txt", ".csv"}
+_SNIFF_BYTES = 8192
+
+class CorpusWalker:
+    """Finds ingestible files with os.scandir, pruning excluded directories before descending.
+
+    Directories are pruned by name (``exclude_dirs``), by hidden prefix, by
+    exclude globs, or because they are another root walked on its own. Files
+    must have a supported extension, match an include glob and no exclude
+    glob (globs apply to the path relative to its root), stay under
+    ``max_file_bytes``, and pass a cheap content sniff: text types must not
+    contain NUL bytes and container types must start with their magic bytes.
+    Every skip is counted in ``stats``.
+    """
+
+    def __init__(self, roots: list[str], extensions: list[str], include_globs: list[str] = None,
+                 exclude_globs: list[str] = None, exclude_dirs: list[str] = None,
+                 max_file_bytes: int = 50 * 1024 * 1024, skip_hidden: bool = True):
+        self.roots = []
+        for root in roots:
+            canonical = os.path.realpath(root)
+            if os.path.isdir(canonical) and canonical not in self.roots:
+                self.roots.append(canonical)
+        self._root_names = {os.path.basename(root) for root in self.roots}
+        self.extensions = {ext.lower() for ext in extensions}
+        self.include_globs = include_globs or ["*"]
+        self.exclude_globs = exclude_globs or []
+        self.exclude_dirs = set(exclude_dirs or [])
+        self.max_file_bytes = max_file_bytes
+        self.skip_hidden = skip_hidden
+        self.stats = {}
+
+    def walk(self) -> list[tuple[str, str, int]]:
+        """Return (canonical path, extension, size) of every accepted file, in a stable order."""
+        self.stats = {
+            "dirs_scanned": 0,
+            "dirs_pruned": 0,
+            "overlapping_roots_pruned": 0,
+            "files_seen": 0,
+            "files_accepted": 0,
+            "skipped_extension": 0,
+            "skipped_excluded": 0,
+            "skipped_hidden": 0,
+            "skipped_oversized": 0,
+            "skipped_binary": 0,
+            "duplicate_paths_skipped": 0,
+            "scan_seconds": 0.0
+        }
+        started = time.perf_counter()
+        files = []
+        seen = set()
+        for root in self.roots:
+            logger.info(f"Scanning directory: {root}")
+            self._scan(root, root, files, seen)
+        self.stats["scan_seconds"] = round(time.perf_counter() - started, 4)
+        self.stats["files_skipped"] = self.stats["files_seen"] - self.stats["files_accepted"]
+        logger.info(f"Corpus scan: {self.stats}")
+        return files
+
+    def _scan(self, root: str, directory: str, files: list, seen: set):
+        self.stats["dirs_scanned"] += 1
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Cannot scan {directory}: {e}")
+            return
+
+        subdirs = []
+        for entry in entries:
+            try:
+                # DirEntry caches d_type, so this needs no extra stat; symlinked dirs are not followed
+                if entry.is_dir(follow_symlinks=False):
+                    if self._prune_dir(root, entry):
+                        self.stats["dirs_pruned"] += 1
+                    else:
+                        subdirs.append(entry.path)
+                elif entry.is_file():
+                    self.stats["files_seen"] += 1
+                    accepted = self._accept_file(root, entry)
+                    if accepted is None:
+                        continue
+                    canonical = os.path.realpath(entry.path)
+                    if canonical in seen:
+                        self.stats["duplicate_paths_skipped"] += 1
+                        continue
+                    seen.add(canonical)
+                    files.append((canonical, accepted[0], accepted[1]))
+                    self.stats["files_accepted"] += 1
+            except OSError as e:
+                logger.warning(f"Skipping {entry.path}: {e}")
+
+        for subdir in subdirs:
+            self._scan(root, subdir, files, seen)
+
+    def _prune_dir(self, root: str, entry: os.DirEntry) -> bool:
+        if entry.name in self.exclude_dirs or (self.skip_hidden and entry.name.startswith(".")):
+            return True
+        relative = os.path.relpath(entry.path, root)
+        # "frontend/*" prunes the frontend directory itself, not just the files in it
+        if self._matches(relative, self.exclude_globs) or self._matches(relative + "/", self.exclude_globs):
+            return True
+        # Another root will be walked on its own (realpath only for names that could be one)
+        if entry.name in self._root_names and os.path.realpath(entry.path) in self.roots:
+            self.stats["overlapping_roots_pruned"] += 1
+            return True
+        return False
+
+    def _accept_file(self, root: str, entry: os.DirEntry):
+        """(extension, size) if the file should be ingested, else None (with the reason counted)."""
+        ext = os.path.splitext(entry.name)[1].lower()
+        if ext not in self.extensions:
+            self.stats["skipped_extension"] += 1
+            return None
+        if self.skip_hidden and entry.name.startswith("."):
+            self.stats["skipped_hidden"] += 1
+            return None
+        relative = os.path.relpath(entry.path, root)
+        if not self._matches(relative, self.include_globs) or self._matches(relative, self.exclude_globs):
+            self.stats["skipped_excluded"] += 1
+            return None
+        size = entry.stat().st_size
+        if size > self.max_file_bytes:
+            self.stats["skipped_oversized"] += 1
+            return None
+        if not self._sniff(entry.path, ext):
+            self.stats["skipped_binary"] += 1
+            return None
+        return ext, size
+
+    @staticmethod
+    def _sniff(path: str, ext: str) -> bool:
+        if ext not in _TEXT_EXTENSIONS and ext not in _MAGIC:
+            return True
+        with open(path, "rb") as f:
+            head = f.read(_SNIFF_BYTES)
+        if ext in _TEXT_EXTENSIONS:
+            return b"\x00" not in head
+        return head.startswith(_MAGIC[ext])
+
+    @staticmethod
+    def _matches(relative_path: str, patterns: list[str]) -> bool:
+        relative_path = relative_path.replace(os.sep, "/")
+        name = relative_path.rsplit("/", 1)[-1]
+        return any(fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+def corpus_walker(extensions: list[str]) -> CorpusWalker:
+    """Walker over settings.DOCS_PATHS configured from Settings."""
+    return CorpusWalker(
+        roots=settings.DOCS_PATHS,
+        extensions=extensions,
+        include_globs=settings.CORPUS_INCLUDE_GLOBS,
+        exclude_globs=settings.CORPUS_EXCLUDE_GLOBS,
+        exclude_dirs=settings.CORPUS_EXCLUDE_DIRS,
+        max_file_bytes=settings.CORPUS_MAX_FILE_BYTES,
+        skip_hidden=settings.CORPUS_SKIP_HIDDEN
+    )
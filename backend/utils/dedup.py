@@ -0,0 +1,95 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from typing import Optional
+import numpy as np
+
+# Mersenne prime modulus for the universal hash family; small enough that a * x fits in uint64
+_PRIME = (1 << 31) - 1
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_DIGIT_RE = re.compile(r"\d")
+
+class ChunkDeduplicator:
+    """Drops exact and near-duplicate chunks before they are embedded.
+
+    Exact duplicates are caught by hashing whitespace-normalized text. Near
+    duplicates use MinHash signatures over word shingles, bucketed with LSH
+    (``bands`` x ``rows`` = ``num_perm``); LSH candidates are then confirmed by
+    their estimated Jaccard similarity against ``threshold``. With the
+    defaults (16 bands of 8 rows) pairs above ~0.7 similarity almost always
+    collide, and the threshold filters the rest.
+
+    A near duplicate must also contain exactly the same numbers, in the same
+    order, as the chunk it matches: spreadsheet rows and report tables that
+    differ only in a few values are similar as text but are different data.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 5,
+                 threshold: float = 0.9, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._exact = set()
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+        self._signatures = []
+        self._numbers = []
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def check(self, text: str) -> Optional[str]:
+        """Return "exact" or "near" if text duplicates an earlier chunk, else remember it and return None."""
+        normalized = " ".join(text.split())
+        digest = hashlib.sha1(normalized.encode("utf-8")).digest()
+        if digest in self._exact:
+            self.exact_duplicates += 1
+            return "exact"
+
+        tokens = _TOKEN_RE.findall(normalized.lower())
+        numbers = hashlib.sha1(" ".join(token for token in tokens if _DIGIT_RE.search(token)).encode("utf-8")).digest()
+        signature = self._signature(tokens)
+        band_keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+        candidates = set()
+        for band, key in enumerate(band_keys):
+            candidates.update(self._buckets[band].get(key, ()))
+        for candidate in candidates:
+            if self._numbers[candidate] == numbers and np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                self.near_duplicates += 1
+                return "near"
+
+        self._exact.add(digest)
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        self._numbers.append(numbers)
+        for band, key in enumerate(band_keys):
+            self._buckets[band][key].append(position)
+        return None
+
+    def stats(self) -> dict:
+        saved = self.exact_duplicates + self.near_duplicates
+        return {
+            "exact_duplicate_chunks": self.exact_duplicates,
+            "near_duplicate_chunks": self.near_duplicates,
+            "chunks_saved": saved,
+            # Titan embeds one text per call, so every dropped chunk is one call saved
+            "embedding_calls_saved": saved
+        }
+
+    def _signature(self, tokens: list[str]) -> np.ndarray:
+        size = self.shingle_size
+        if len(tokens) <= size:
+            shingles = {" ".join(tokens)}
+        else:
+            shingles = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) % _PRIME for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # (a * x + b) mod p for every permutation and shingle at once, then min per permutation
+        return ((hashes[:, None] * self._a + self._b) % np.uint64(_PRIME)).min(axis=0)
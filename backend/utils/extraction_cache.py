@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Optional
+from core.config import settings
+from core.eviction import eviction_victims
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction or chunking logic changes so stale entries are ignored
+EXTRACTOR_VERSION = 1
+
+class ExtractionCache:
+    """On-disk cache of extracted text and chunk boundaries.
+
+    Entries are keyed by the file's content hash (plus extension and extractor
+    version) and stored zlib-compressed. A small per-path index remembers the
+    size/mtime seen for each path, so unchanged files are resolved with a
+    single ``stat`` and no hashing or parsing. Blobs are evicted least
+    recently used first, and index entries go with the blob they point to.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.blobs_dir = os.path.join(cache_dir, "blobs")
+        self.index_dir = os.path.join(cache_dir, "index")
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.hits = 0
+        self.misses = 0
+
+        if self.enabled:
+            try:
+                os.makedirs(self.blobs_dir, exist_ok=True)
+                os.makedirs(self.index_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Extraction cache disabled, cannot create {cache_dir}: {e}")
+                self.enabled = False
+
+    def fingerprint(self, file_path: str, file_ext: str) -> Optional[str]:
+        """Return the cache key for a file, hashing its content only if it changed."""
+        if not self.enabled:
+            return None
+        try:
+            stat = os.stat(file_path)
+            index_path = self._index_path(file_path)
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                    return entry["key"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+            content_hash = self._hash_file(file_path)
+            key = hashlib.sha256(
+                f"{content_hash}|{file_ext}|{EXTRACTOR_VERSION}".encode("utf-8")
+            ).hexdigest()
+            self._write_atomic(index_path, json.dumps({
+                "path": os.path.abspath(file_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": content_hash,
+                "key": key
+            }).encode("utf-8"))
+            return key
+        except OSError as e:
+            logger.warning(f"Could not fingerprint {file_path}: {e}")
+            return None
+
+    def get(self, key: Optional[str]) -> Optional[dict]:
+        """Load a cached entry ({"text": ..., "chunks": {...}}) or None."""
+        if not key:
+            return None
+        blob_path = self._blob_path(key)
+        try:
+            with open(blob_path, "rb") as f:
+                entry = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+            # Touch so eviction is least-recently-used
+            os.utime(blob_path, None)
+            self.hits += 1
+            return entry
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"Discarding corrupt extraction cache entry {key}: {e}")
+            self._remove(blob_path)
+            self.misses += 1
+            return None
+
+    def put(self, key: Optional[str], entry: dict):
+        """Store an entry and evict old ones if the cache grew past its size cap."""
+        if not key:
+            return
+        try:
+            data = zlib.compress(json.dumps(entry, ensure_ascii=False).encode("utf-8"), 6)
+            blob_path = self._blob_path(key)
+            previous = os.path.getsize(blob_path) if os.path.exists(blob_path) else 0
+            self._write_atomic(blob_path, data)
+            with self._lock:
+                if self._total_bytes is not None:
+                    self._total_bytes += len(data) - previous
+            self._evict_if_needed()
+        except OSError as e:
+            logger.warning(f"Could not write extraction cache entry {key}: {e}")
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process."""
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses}
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(e.stat().st_size for e in os.scandir(self.blobs_dir) if e.is_file())
+            if self._total_bytes <= self.max_bytes:
+                return
+
+            blobs = sorted(
+                (e.stat().st_mtime, e.stat().st_size, e.path)
+                for e in os.scandir(self.blobs_dir) if e.is_file()
+            )
+            # Least recently used first
+            victims = eviction_victims(((size, (size, path)) for _, size, path in blobs), self._total_bytes, self.max_bytes)
+            for size, path in victims:
+                if self._remove(path):
+                    self._total_bytes -= size
+            removed_entries = self._prune_index()
+            logger.info(f"Extraction cache evicted down to {self._total_bytes} bytes ({removed_entries} index entries)")
+
+    def _prune_index(self) -> int:
+        """Remove index entries whose blob is gone (evicted, or never written); returns how many."""
+        live_keys = {e.name[:-len(".json.z")] for e in os.scandir(self.blobs_dir) if e.name.endswith(".json.z")}
+        removed = 0
+        for entry in os.scandir(self.index_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    key = json.load(f)["key"]
+            except (OSError, ValueError, KeyError):
+                key = None
+            if key not in live_keys and self._remove(entry.path):
+                removed += 1
+        return removed
+
+    def _index_path(self, file_path: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.index_dir, f"{digest}.json")
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.blobs_dir, f"{key}.json.z")
+
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+class ExtractionTimer:
+    """Accumulates parse time and cache hits for one ingestion run."""
+
+    def __init__(self):
+        self.parse_seconds = 0.0
+        self.cache_hits = 0
+        self.files_parsed = 0
+        self._started = time.perf_counter()
+
+    def summary(self) -> dict:
+        return {
+            "cache_hits": self.cache_hits,
+            "files_parsed": self.files_parsed,
+            "parse_seconds": round(self.parse_seconds, 3),
+            "elapsed_seconds": round(time.perf_counter() - self._started, 3)
+        }
+
+# Global instance
+extraction_cache = ExtractionCache(
+    cache_dir=settings.EXTRACTION_CACHE_DIR,
+    max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+    enabled=settings.EXTRACTION_CACHE_ENABLED
+)
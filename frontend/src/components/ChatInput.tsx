@@ -6,10 +6,11 @@ import { cn } from "@/lib/utils";
 
 interface ChatInputProps {
   onSendMessage: (message: string) => void;
+  onDraftChange?: (draft: string) => void;
   disabled?: boolean;
 }
 
-const ChatInput = ({ onSendMessage, disabled }: ChatInputProps) => {
+const ChatInput = ({ onSendMessage, onDraftChange, disabled }: ChatInputProps) => {
   const [message, setMessage] = useState("");
 
   const handleSubmit = (e: React.FormEvent) => {
@@ -36,7 +37,10 @@ const ChatInput = ({ onSendMessage, disabled }: ChatInputProps) => {
         <div className="flex gap-3 items-end">
           <Textarea
             value={message}
-            onChange={(e) => setMessage(e.target.value)}
+            onChange={(e) => {
+              setMessage(e.target.value);
+              onDraftChange?.(e.target.value);
+            }}
             onKeyDown={handleKeyDown}
             placeholder="Escribe tu pregunta sobre sostenibilidad..."
             className={cn(
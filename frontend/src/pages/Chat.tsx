@@ -5,6 +5,10 @@ import ChatInput from "@/components/ChatInput";
 import ChatWelcome from "@/components/ChatWelcome";
 import { ScrollArea } from "@/components/ui/scroll-area";
 
+// Wait this long after the last keystroke before prefetching retrieval for the draft
+const PREFETCH_DEBOUNCE_MS = 400;
+const PREFETCH_MIN_CHARS = 12;
+
 interface Message {
   id: string;
   text: string;
@@ -16,6 +20,12 @@ const Chat = () => {
   const [messages, setMessages] = useState<Message[]>([]);
   const [isLoading, setIsLoading] = useState(false);
   const scrollRef = useRef<HTMLDivElement>(null);
+  const prefetchTimer = useRef<ReturnType<typeof setTimeout>>();
+  const prefetchController = useRef<AbortController>();
+  const sessionId = useRef(crypto.randomUUID());
+  // Assigned by the backend on the first answer and sent back with every later question
+  const conversationId = useRef<string>();
+  const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
   const scrollToBottom = () => {
     if (scrollRef.current) {
@@ -27,7 +37,32 @@ const Chat = () => {
     scrollToBottom();
   }, [messages]);
 
+  useEffect(() => () => clearTimeout(prefetchTimer.current), []);
+
+  const cancelPrefetch = () => {
+    clearTimeout(prefetchTimer.current);
+    prefetchController.current?.abort();
+  };
+
+  // Best effort: lets the backend retrieve documents while the user is still typing
+  const handleDraftChange = (draft: string) => {
+    cancelPrefetch();
+    if (draft.trim().length < PREFETCH_MIN_CHARS) return;
+
+    prefetchTimer.current = setTimeout(() => {
+      const controller = new AbortController();
+      prefetchController.current = controller;
+      fetch(`${apiUrl}/api/prefetch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ text: draft, session_id: sessionId.current }),
+        signal: controller.signal
+      }).catch(() => {});
+    }, PREFETCH_DEBOUNCE_MS);
+  };
+
   const handleSendMessage = async (text: string) => {
+    clearTimeout(prefetchTimer.current);
     const userMessage: Message = {
       id: Date.now().toString(),
       text,
@@ -42,11 +77,10 @@ const Chat = () => {
     setIsLoading(true);
 
     try {
-      const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
       const response = await fetch(`${apiUrl}/api/chat`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: text })
+        body: JSON.stringify({ message: text, conversation_id: conversationId.current })
       });
 
       if (!response.ok) {
@@ -54,6 +88,7 @@ const Chat = () => {
       }
 
       const data = await response.json();
+      conversationId.current = data.conversation_id;
 
       const assistantMessage: Message = {
         id: (Date.now() + 1).toString(),
@@ -116,7 +151,7 @@ const Chat = () => {
         </div>
       </ScrollArea>
 
-      <ChatInput onSendMessage={handleSendMessage} disabled={isLoading} />
+      <ChatInput onSendMessage={handleSendMessage} onDraftChange={handleDraftChange} disabled={isLoading} />
     </div>
   );
 };